@@ -0,0 +1,265 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+
+# --- Compact Binary Question-Bank Format ---
+#
+# Um livro inteiro vira um único arquivo: uma tabela de strings internadas (cada
+# texto repetido, como instruções e exemplos, é gravado uma vez só) e um registro
+# binário por questão, com uma tabela de offsets no final. O arquivo é aberto com
+# mmap e cada questão só é decodificada quando é sorteada.
+#
+# Layout:
+#   header   MAGIC, version, n_strings, n_questions, strings_table_pos, questions_table_pos
+#   strings  UTF-8 concatenadas
+#   records  uma questão por registro (valores marcados por tipo, strings por índice)
+#   tables   (n_strings + 1) offsets u32 das strings, (n_questions + 1) offsets u64 dos registros
+
+MAGIC = b"CCBQ"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIIQQ")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_F64 = struct.Struct("<d")
+
+_TAG_NONE, _TAG_FALSE, _TAG_TRUE, _TAG_INT, _TAG_STR, _TAG_LIST, _TAG_DICT, _TAG_FLOAT = range(8)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos: int) -> tuple:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, text: str) -> int:
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+
+def _encode_value(out: bytearray, value, strings: _StringTable):
+    if value is None:
+        out.append(_TAG_NONE)
+    elif value is True:
+        out.append(_TAG_TRUE)
+    elif value is False:
+        out.append(_TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(_TAG_INT)
+        _write_varint(out, (value << 1) ^ (value >> 63) if value < 0 else value << 1)
+    elif isinstance(value, float):
+        out.append(_TAG_FLOAT)
+        out += _F64.pack(value)
+    elif isinstance(value, str):
+        out.append(_TAG_STR)
+        _write_varint(out, strings.intern(value))
+    elif isinstance(value, (list, tuple)):
+        out.append(_TAG_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _encode_value(out, item, strings)
+    elif isinstance(value, dict):
+        out.append(_TAG_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _write_varint(out, strings.intern(str(key)))
+            _encode_value(out, item, strings)
+    else:
+        raise TypeError(f"Unsupported value in question bank: {type(value).__name__}")
+
+
+def write_bank(path: str, questions: list):
+    """Packs a list of question dicts into a single bank file (written atomically)."""
+    strings = _StringTable()
+    records = bytearray()
+    record_offsets = []
+    for q in questions:
+        record_offsets.append(len(records))
+        _encode_value(records, q, strings)
+    record_offsets.append(len(records))
+
+    string_data = bytearray()
+    string_offsets = []
+    for text in strings.strings:
+        string_offsets.append(len(string_data))
+        string_data += text.encode('utf-8')
+    string_offsets.append(len(string_data))
+
+    strings_pos = _HEADER.size
+    records_pos = strings_pos + len(string_data)
+    strings_table_pos = records_pos + len(records)
+    questions_table_pos = strings_table_pos + _U32.size * len(string_offsets)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(strings.strings), len(questions),
+                             strings_table_pos, questions_table_pos))
+        f.write(string_data)
+        f.write(records)
+        f.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+        f.write(struct.pack(f"<{len(record_offsets)}Q", *(records_pos + o for o in record_offsets)))
+    os.replace(tmp_path, path)
+
+
+class BankReader:
+    """
+    Memory-mapped view of a bank file; questions are decoded on demand. With `data`,
+    the bank is read from those bytes instead (e.g. to check a bank before saving it).
+    """
+
+    def __init__(self, path: str, data: bytes = None):
+        self.path = path
+        if data is not None:
+            self._map = data
+        else:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.n_strings, self.n_questions, self._strings_table_pos, self._questions_table_pos = \
+                _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} question bank")
+        self._strings = [None] * self.n_strings
+
+    def __len__(self):
+        return self.n_questions
+
+    def string(self, string_id: int) -> str:
+        text = self._strings[string_id]
+        if text is None:
+            start, end = struct.unpack_from("<II", self._map, self._strings_table_pos + _U32.size * string_id)
+            text = self._strings[string_id] = self._map[_HEADER.size + start:_HEADER.size + end].decode('utf-8')
+        return text
+
+    def _decode(self, pos: int) -> tuple:
+        buf = self._map
+        tag = buf[pos]
+        pos += 1
+        if tag == _TAG_STR:
+            string_id, pos = _read_varint(buf, pos)
+            return self.string(string_id), pos
+        if tag == _TAG_DICT:
+            size, pos = _read_varint(buf, pos)
+            value = {}
+            for _ in range(size):
+                key_id, pos = _read_varint(buf, pos)
+                value[self.string(key_id)], pos = self._decode(pos)
+            return value, pos
+        if tag == _TAG_LIST:
+            size, pos = _read_varint(buf, pos)
+            value = []
+            for _ in range(size):
+                item, pos = self._decode(pos)
+                value.append(item)
+            return value, pos
+        if tag == _TAG_INT:
+            raw, pos = _read_varint(buf, pos)
+            return (raw >> 1) ^ -(raw & 1), pos
+        if tag == _TAG_FLOAT:
+            return _F64.unpack_from(buf, pos)[0], pos + _F64.size
+        return {_TAG_NONE: None, _TAG_TRUE: True, _TAG_FALSE: False}[tag], pos
+
+    def check(self):
+        """
+        Raises ValueError unless the header and both offset tables lie inside the file and
+        the offsets are in order (a cheap structural check for banks from untrusted sources).
+        """
+        size = len(self._map)
+        strings_end = self._strings_table_pos + _U32.size * (self.n_strings + 1)
+        if not _HEADER.size <= self._strings_table_pos <= strings_end <= self._questions_table_pos \
+                or self._questions_table_pos + _U64.size * (self.n_questions + 1) != size:
+            raise ValueError(f"{self.path}: corrupt bank tables")
+        string_offsets = struct.unpack_from(f"<{self.n_strings + 1}I", self._map, self._strings_table_pos)
+        record_offsets = struct.unpack_from(f"<{self.n_questions + 1}Q", self._map, self._questions_table_pos)
+        if any(a > b for a, b in zip(string_offsets, string_offsets[1:])) or string_offsets[0] != 0 \
+                or _HEADER.size + string_offsets[-1] != record_offsets[0] \
+                or any(a > b for a, b in zip(record_offsets, record_offsets[1:])) \
+                or record_offsets[-1] != self._strings_table_pos:
+            raise ValueError(f"{self.path}: corrupt bank offsets")
+
+    def question(self, ref: int) -> dict:
+        """Decodes the question stored at position `ref`."""
+        if not 0 <= ref < self.n_questions:
+            raise IndexError(ref)
+        offset = _U64.unpack_from(self._map, self._questions_table_pos + _U64.size * ref)[0]
+        return self._decode(offset)[0]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+
+_open_readers = {}
+_readers_lock = threading.Lock()
+
+
+def open_bank(path: str) -> BankReader:
+    """Returns a shared reader for a bank file (bank files are immutable once written)."""
+    reader = _open_readers.get(path)
+    if reader is None:
+        with _readers_lock:
+            reader = _open_readers.get(path)
+            if reader is None:
+                reader = _open_readers[path] = BankReader(path)
+    return reader
+
+
+def forget_stale_banks(path_prefix: str, keep: tuple):
+    """
+    Drops the shared readers of the bank files whose path starts with path_prefix, except
+    those in keep. They are not closed: a streaming booklet or a queued job may still be
+    reading one, and its mmap is released when the last of them lets go of the reader.
+    """
+    with _readers_lock:
+        for path in [path for path in _open_readers if path.startswith(path_prefix) and path not in keep]:
+            del _open_readers[path]
+
+
+def main(argv: list = None) -> int:
+    from question_bank import BOOKS_DIR, load_book_index
+
+    parser = argparse.ArgumentParser(description="Compiles a book into the compact bank format and reports its size.")
+    parser.add_argument("book")
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    args = parser.parse_args(argv)
+
+    book_index = load_book_index(args.book, args.books_dir)
+    if not book_index["bank_path"]:
+        print(f"error: book '{args.book}' not found in '{args.books_dir}'", file=sys.stderr)
+        return 1
+    json_size = sum(size for _mtime, size in book_index["signature"].values())
+    reader = open_bank(book_index["bank_path"])
+    print(book_index["bank_path"])
+    print(f"{len(reader)} questions, {reader.n_strings} distinct strings")
+    print(f"JSON: {json_size} bytes | bank: {os.path.getsize(book_index['bank_path'])} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
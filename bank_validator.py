@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from bank_format import open_bank
+from question_bank import (BOOKS_DIR, INDEX_CACHE_DIR, list_books, parse_question_file, refresh_book_index,
+                           scan_book_files)
+
+# --- Question-Bank Validator and Compiler ---
+#
+# Compila todos os livros em paralelo (um processo por livro) no mesmo índice/banco
+# binário que o servidor lê de .cache/, já normalizado, e confere cada questão:
+#
+#   python bank_validator.py                      # todos os livros de BOOKS/
+#   python bank_validator.py ELEMENTARY --json relatorio.json
+#
+# Erros (JSON inválido, campos obrigatórios ausentes, tópicos malformados) fazem o
+# comando sair com código 1; avisos (tipo desconhecido, tópico de outra unidade) não.
+
+# Tipos com formatação própria em question_body_lines() e os tipos genéricos já usados no banco
+FORMATTED_TYPE_PREFIXES = (
+    "tick_correct_sentence", "select_correct_sentence", "underline_correct_word", "select_correct_possessive_adjective",
+    "fill_in_from_word_bank", "match_question_answer", "order_the_words", "create_sentence",
+)
+KNOWN_QUESTION_TYPES = {
+    "complete_the_lists_numbers_days", "country_nationality_match", "fill_in_the_blanks", "fill_in_the_blanks_conjugation",
+    "fill_in_the_blanks_letters", "fill_in_the_blanks_one_word", "fill_in_the_blanks_sequence",
+    "fill_in_the_blanks_verb_be", "fill_in_the_blanks_verb_ing", "fill_in_the_blanks_word", "match_verb_to_phrase",
+    "select_correct_word", "short_answer",
+}
+REQUIRED_FIELDS = ("id", "instructions", "type", "topic")
+TOPIC_CODE = re.compile(r"(\d+)([A-Z]*)")
+ERROR, WARNING = "error", "warning"
+
+
+def is_known_type(q_type: str) -> bool:
+    return q_type in KNOWN_QUESTION_TYPES or q_type.startswith(FORMATTED_TYPE_PREFIXES)
+
+
+def validate_question(q: dict, unit_folder: str) -> list:
+    """Returns (level, message) problems of one (normalized) question."""
+    problems = []
+    for field in REQUIRED_FIELDS:
+        if q.get(field) in (None, "", []):
+            problems.append((ERROR, f"missing '{field}'"))
+
+    qa_pairs = q.get("qa_pairs")
+    if not isinstance(qa_pairs, list) or not qa_pairs:
+        problems.append((ERROR, "missing 'qa_pair'/'qa_pairs'"))
+    else:
+        for i, pair in enumerate(qa_pairs, start=1):
+            if not isinstance(pair, dict) or "item" not in pair or "answer" not in pair:
+                problems.append((ERROR, f"qa_pairs[{i}] needs 'item' and 'answer'"))
+
+    q_type = q.get("type")
+    if isinstance(q_type, str) and q_type and not is_known_type(q_type):
+        problems.append((WARNING, f"unknown type '{q_type}' (rendered as a generic list)"))
+    if q_type == "fill_in_from_word_bank" and not q.get("options"):
+        problems.append((WARNING, "fill_in_from_word_bank without 'options'"))
+
+    topics = q.get("topic")
+    if topics is not None and not isinstance(topics, list):
+        problems.append((ERROR, "'topic' must be a list of unit codes"))
+    elif topics:
+        for topic in topics:
+            match = TOPIC_CODE.fullmatch(topic) if isinstance(topic, str) else None
+            if match is None:
+                problems.append((ERROR, f"malformed topic code {topic!r} (expected e.g. '1A')"))
+            elif match.group(1) != unit_folder:
+                # build_question_pool só aceita tópicos da própria unidade: a questão nunca seria sorteada
+                problems.append((WARNING, f"topic '{topic}' does not belong to unit {unit_folder}"))
+    return problems
+
+
+def _book_files(book: str, books_dir: str, cache_dir: str) -> tuple:
+    """
+    Compiles the book and returns (index or None, compile error or None, {file: (entry, questions)}).
+    When the index cannot be built, the files are read one by one, so that the report
+    still points at the questions that broke it.
+    """
+    try:
+        book_index = refresh_book_index(book, books_dir, cache_dir)
+    except Exception as e:
+        book_path = os.path.join(books_dir, book)
+        files = {}
+        for relative_path in scan_book_files(book_path):
+            entry = parse_question_file(book_path, relative_path)
+            files[relative_path] = (entry, entry["questions"])
+        return None, f"{type(e).__name__}: {e}", files
+    bank = open_bank(book_index["bank_path"]) if book_index["bank_path"] else None
+    files = {relative_path: (entry, [bank.question(meta["ref"]) for meta in entry["questions"]])
+             for relative_path, entry in book_index["files"].items()}
+    return book_index, None, files
+
+
+def validate_book(book: str, books_dir: str = BOOKS_DIR, cache_dir: str = INDEX_CACHE_DIR) -> dict:
+    """Compiles one book (index + bank file) and returns its validation report."""
+    started = time.perf_counter()
+    book_index, compile_error, files = _book_files(book, books_dir, cache_dir)
+    report = {"book": book, "files": len(files), "questions": sum(len(questions) for _, questions in files.values()),
+              "bank_path": book_index["bank_path"] if book_index else None, "problems": []}
+    if compile_error:
+        report["problems"].append({"level": ERROR, "file": None, "question": None,
+                                   "message": f"the book index could not be compiled: {compile_error}"})
+
+    for relative_path, (entry, questions) in sorted(files.items()):
+        def add(level, message, question_id=None):
+            report["problems"].append({"level": level, "file": relative_path, "question": question_id,
+                                       "message": message})
+
+        if entry["error"]:
+            add(ERROR, f"invalid file: {entry['error']}")
+            continue
+        if entry["section"] is None:
+            add(ERROR, "file name does not end in -GRAMMAR.json or -VOCABULARY.json")
+        if not entry["questions"]:
+            add(WARNING, "file has no questions")
+
+        seen_ids = set()
+        for q in questions:
+            if q.get("id") in seen_ids:
+                add(WARNING, f"duplicate id {q.get('id')!r} in the file", q.get("id"))
+            seen_ids.add(q.get("id"))
+            for level, message in validate_question(q, entry["unit"]):
+                add(level, message, q.get("id"))
+
+    report["errors"] = sum(1 for p in report["problems"] if p["level"] == ERROR)
+    report["warnings"] = sum(1 for p in report["problems"] if p["level"] == WARNING)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def validate_books(books: list, books_dir: str = BOOKS_DIR, cache_dir: str = INDEX_CACHE_DIR,
+                   max_workers: int = None) -> list:
+    """Validates and compiles the books in parallel, one process per book."""
+    max_workers = max_workers or min(len(books), os.cpu_count() or 1)
+    if max_workers <= 1:
+        return [validate_book(book, books_dir, cache_dir) for book in books]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(validate_book, books, [books_dir] * len(books), [cache_dir] * len(books)))
+
+
+def format_report(reports: list, show_warnings: bool = True) -> str:
+    lines = []
+    for report in reports:
+        lines.append(f"{report['book']}: {report['files']} files, {report['questions']} questions, "
+                     f"{report['errors']} errors, {report['warnings']} warnings ({report['seconds']:.2f} s)")
+        for problem in report["problems"]:
+            if problem["level"] == WARNING and not show_warnings:
+                continue
+            question = f" question {problem['question']}" if problem["question"] is not None else ""
+            lines.append(f"  {problem['level']}: {problem['file'] or report['book']}{question}: {problem['message']}")
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Validates the question bank and compiles every book in parallel.")
+    parser.add_argument("books", nargs="*", help="Books to check (default: every book in --books-dir).")
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    parser.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="Where the compiled indexes and banks are written.")
+    parser.add_argument("--workers", type=int, help="Parallel processes (default: one per book, up to the CPU count).")
+    parser.add_argument("--json", help="Also write the full report as JSON to this file.")
+    parser.add_argument("--errors-only", action="store_true", help="Do not list the warnings.")
+    args = parser.parse_args(argv)
+
+    books = args.books or sorted(list_books(args.books_dir))
+    missing = [book for book in books if not os.path.isdir(os.path.join(args.books_dir, book))]
+    if missing:
+        print(f"error: book(s) not found in '{args.books_dir}': {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    reports = validate_books(books, args.books_dir, args.cache_dir, args.workers)
+    print(format_report(reports, show_warnings=not args.errors_only))
+    print(f"{len(reports)} books compiled in {time.perf_counter() - started:.2f} s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 1 if any(report["errors"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
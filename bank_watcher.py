@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+from question_bank import BOOKS_DIR, INDEX_CACHE_DIR, list_books, load_book_index, refresh_book_index, watch_books_dir
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog é opcional: sem ele, o diretório é verificado periodicamente
+    FileSystemEventHandler = object
+    Observer = None
+
+# --- Incremental Reload of the BOOKS Directory ---
+#
+# Observa BOOKS_DIR e, quando um arquivo de questões é criado, alterado ou removido,
+# recompila apenas o livro afetado (e, dentro dele, apenas os arquivos alterados).
+# Não é preciso reiniciar o servidor para publicar novas questões.
+
+WATCH_DEBOUNCE = float(os.environ.get("CCB_WATCH_DEBOUNCE", 0.5))
+WATCH_POLL_INTERVAL = float(os.environ.get("CCB_WATCH_POLL_INTERVAL", 5.0))
+
+logger = logging.getLogger(__name__)
+
+
+class _BooksEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class BankWatcher:
+    """
+    Keeps the in-memory indexes of a books directory up to date. Uses watchdog when it
+    is installed and falls back to checking the file signatures every poll_interval.
+    """
+
+    def __init__(self, books_dir: str = BOOKS_DIR, cache_dir: str = INDEX_CACHE_DIR,
+                 debounce: float = WATCH_DEBOUNCE, poll_interval: float = WATCH_POLL_INTERVAL):
+        self.books_dir = books_dir
+        self.cache_dir = cache_dir
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.listeners = []
+        self._dirty_books = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    def start(self, background: bool = False):
+        """
+        Builds the index of every book and starts watching. With background=True the
+        initial build runs in the watcher thread and start() returns at once; meanwhile a
+        book that is needed is compiled on demand by load_book_index.
+        """
+        if not background:
+            for book in list_books(self.books_dir):
+                refresh_book_index(book, self.books_dir, self.cache_dir)
+        if Observer is not None and os.path.isdir(self.books_dir):
+            self._observer = Observer()
+            self._observer.schedule(_BooksEventHandler(self), self.books_dir, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        watch_books_dir(self.books_dir)
+        self._thread = threading.Thread(target=self._run, args=(background,), name="bank-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        watch_books_dir(self.books_dir, watched=False)
+        self._stopped.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def add_listener(self, callback):
+        """Registers callback(book_name, index), called after a book index is refreshed."""
+        self.listeners.append(callback)
+
+    def notify(self, path: str):
+        """Marks the book that contains `path` for a refresh."""
+        relative_path = os.path.relpath(os.path.abspath(path), os.path.abspath(self.books_dir))
+        book = relative_path.split(os.sep)[0]
+        if book in (os.curdir, os.pardir) or relative_path.startswith(os.pardir):
+            return
+        with self._lock:
+            self._dirty_books.add(book)
+        self._wakeup.set()
+
+    def _run(self, initial_build: bool = False):
+        if initial_build:
+            for book in sorted(list_books(self.books_dir)):
+                if self._stopped.is_set():
+                    return
+                self.refresh(book)
+        # Com watchdog, só os eventos acordam a thread; sem ele, todos os livros são verificados a cada poll_interval
+        timeout = self.poll_interval if self._observer is None else None
+        while not self._stopped.is_set():
+            woken = self._wakeup.wait(timeout=timeout)
+            if self._stopped.is_set():
+                return
+            if woken:
+                # Agrupa as várias notificações de um mesmo salvamento
+                self._stopped.wait(self.debounce)
+            self._wakeup.clear()
+
+            with self._lock:
+                dirty_books, self._dirty_books = self._dirty_books, set()
+            if not woken:
+                dirty_books.update(list_books(self.books_dir))
+
+            for book in sorted(dirty_books):
+                self.refresh(book)
+
+    def refresh(self, book: str):
+        """Re-checks a book and notifies the listeners when its index was rebuilt."""
+        try:
+            previous = load_book_index(book, self.books_dir, self.cache_dir)
+            index = refresh_book_index(book, self.books_dir, self.cache_dir)
+        except Exception:
+            logger.exception("Could not refresh the index of book %s", book)
+            return
+        if index is previous:
+            return
+        for callback in self.listeners:
+            try:
+                callback(book, index)
+            except Exception:
+                logger.exception("Bank watcher listener failed for book %s", book)
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from exam_api import ExamApi
+from exam_generator import EXAM_CACHE
+from exam_jobs import JobQueue
+from question_bank import BOOKS_DIR
+
+# --- HTTP API Load Test ---
+#
+# Dispara `--clients` clientes simultâneos, cada um com `--requests` pedidos de prova.
+# Uma fração `--duplicates` dos pedidos repete o mesmo código de prova, como numa
+# turma inteira abrindo o mesmo link do LMS ao mesmo tempo. Mede latência, vazão e
+# quantas gerações foram poupadas pela coalescência.
+#
+#   python benchmarks/bench_api.py --clients 32 --requests 10            # ASGI em processo, sem servidor
+#   python benchmarks/bench_api.py --url http://127.0.0.1:8000 --clients 32
+#
+# Com --url, cada cliente mantém uma única conexão keep-alive para todos os seus pedidos.
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _exam_paths(book: str, clients: int, requests: int, duplicates: float) -> list:
+    """One list of GET /exams/<id> paths per client; the duplicated IDs are shared by every client."""
+    shared = [f"/exams/{book}-1ABC.2ABC-G3V3-{seed}-S2" for seed in range(1, 4)]
+    paths = []
+    for client in range(clients):
+        client_paths = []
+        for i in range(requests):
+            if (i * clients + client) % 100 < duplicates * 100:
+                client_paths.append(shared[i % len(shared)])
+            else:
+                client_paths.append(f"/exams/{book}-1ABC.2ABC-G3V3-{1000 + i * clients + client}-S2")
+        paths.append(client_paths)
+    return paths
+
+
+async def _asgi_get(app: ExamApi, path: str) -> tuple:
+    """Calls the ASGI app in process, as a server would, and returns (status, body size)."""
+    response = {"status": None, "size": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["size"] += len(message.get("body", b""))
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b""}
+    await app(scope, receive, send)
+    return response["status"], response["size"]
+
+
+def run_in_process(paths: list, books_dir: str, workers: int) -> list:
+    app = ExamApi(books_dir, queue=JobQueue(max_workers=workers, max_pending=sum(map(len, paths))))
+
+    async def client(client_paths: list, timings: list):
+        for path in client_paths:
+            started = time.perf_counter()
+            status, _size = await _asgi_get(app, path)
+            timings.append((time.perf_counter() - started, status))
+
+    async def run_all():
+        timings = []
+        await asyncio.gather(*(client(client_paths, timings) for client_paths in paths))
+        return timings
+
+    try:
+        return asyncio.run(run_all())
+    finally:
+        app.queue.shutdown()
+
+
+def run_over_http(paths: list, url: str) -> list:
+    target = urlsplit(url)
+    timings = []
+    lock = threading.Lock()
+
+    def client(client_paths: list):
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+        for path in client_paths:
+            started = time.perf_counter()
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            with lock:
+                timings.append((time.perf_counter() - started, response.status))
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(client_paths,)) for client_paths in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test of the exam-generation HTTP API.")
+    parser.add_argument("--url", help="Base URL of a running server; by default the ASGI app runs in process.")
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    parser.add_argument("--book", default="ELEMENTARY")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per client.")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="Fraction of requests for the same exam IDs.")
+    parser.add_argument("--workers", type=int, default=4, help="Generation jobs in parallel (in-process mode).")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    metrics.set_enabled(True)
+    EXAM_CACHE.clear()
+    paths = _exam_paths(args.book, args.clients, args.requests, args.duplicates)
+    started = time.perf_counter()
+    if args.url:
+        timings = run_over_http(paths, args.url)
+    else:
+        timings = run_in_process(paths, args.books_dir, args.workers)
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _status in timings]
+    counters = metrics.snapshot()["counters"]
+    results = {
+        "requests": len(timings),
+        "errors": sum(1 for _latency, status in timings if status != 200),
+        "elapsed_s": elapsed,
+        "requests_per_s": len(timings) / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "coalesced": counters.get("api_requests_coalesced", 0),
+        "generated": counters.get("exams_generated", 0),
+        "cache_hits": counters.get("exam_cache_hits", 0),
+    }
+    print(f"{results['requests']} requests ({results['errors']} errors) in {elapsed:.2f} s: "
+          f"{results['requests_per_s']:.1f} req/s | mean {results['mean_ms']:.1f} ms | "
+          f"p50 {results['p50_ms']:.1f} ms | p95 {results['p95_ms']:.1f} ms")
+    if not args.url:
+        print(f"generated {results['generated']} | coalesced {results['coalesced']} | "
+              f"served from cache {results['cache_hits']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
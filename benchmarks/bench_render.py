@@ -0,0 +1,148 @@
+import argparse
+import io
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Pt
+from exam_generator import build_question_pool, render_exam_docx, select_questions
+from question_bank import BOOKS_DIR, load_book_index, load_questions
+
+# --- Render Benchmark: template engine vs. the previous python-docx renderer ---
+#
+#   python benchmarks/bench_render.py --book ELEMENTARY --grammar 25 --vocabulary 25
+
+
+def legacy_write_question_to_doc(doc, question_data, question_number):
+    """Previous renderer: one add_paragraph per line plus empty spacer paragraphs."""
+    q_instructions = question_data.get("instructions", "")
+    q_type = question_data.get("type")
+
+    p_question_num = doc.add_paragraph()
+    p_question_num.add_run(f"{question_number}. ").bold = True
+    p_question_num.add_run(q_instructions).bold = True
+    doc.add_paragraph()
+
+    example_data = question_data.get("example")
+    if isinstance(example_data, dict):
+        doc.add_paragraph(f"Example: {example_data.get('item', '')}")
+    elif isinstance(example_data, str):
+        doc.add_paragraph(f"Example: {example_data}")
+
+    qa_pairs = question_data.get("qa_pairs") or question_data.get("qa_pair", [])
+
+    if q_type in ["tick_correct_sentence", "select_correct_sentence"]:
+        for i, pair in enumerate(qa_pairs):
+            options = pair.get("item", "").split(' / ')
+            options_text_list = [f"( ) {o}" if j == 0 and re.match(r"^[A-D]\s", o) else o for j, o in enumerate(options)]
+            doc.add_paragraph(f"{i+1}. {' '.join(options_text_list)}")
+            doc.add_paragraph()
+    elif q_type.startswith(("underline_correct_word", "select_correct_possessive_adjective",
+                            "underline_correct_word_subject_possessive", "underline_correct_word_or_phrase")):
+        for i, pair in enumerate(qa_pairs):
+            doc.add_paragraph(f"{i+1}. {pair.get('item', '').replace('/', ' / ')}")
+            doc.add_paragraph()
+    elif qa_pairs:
+        if q_type == "match_question_answer":
+            doc.add_paragraph("Match the questions and answers:")
+        for i, pair in enumerate(qa_pairs):
+            item_text = pair.get("item", "")
+            if q_type == "match_question_answer":
+                doc.add_paragraph(f"({i+1}) {item_text}")
+                doc.add_paragraph("------------------------------------")
+            elif q_type.startswith("order_the_words") or q_type.startswith("create_sentence"):
+                doc.add_paragraph(f"{i+1}. Prompts: {item_text}")
+                doc.add_paragraph("____________________________________________________________________")
+            else:
+                doc.add_paragraph(f"{i+1}. {item_text}")
+        doc.add_paragraph()
+
+
+def legacy_render(book: str, question_list: list) -> io.BytesIO:
+    final_doc = Document()
+    font = final_doc.styles['Normal'].font
+    font.name = 'Calibri'
+    font.size = Pt(11)
+    final_doc.add_heading(f"English Test - Book: {book}", level=0)
+    final_doc.add_paragraph("Name: ____________ Date: ___/___/______")
+    final_doc.add_paragraph()
+
+    current_section = None
+    for number, q_data in enumerate(sorted(question_list, key=lambda q: q['section']), start=1):
+        if q_data['section'] != current_section:
+            current_section = q_data['section']
+            final_doc.add_heading(f"Section: {current_section.capitalize()}", level=1)
+        legacy_write_question_to_doc(final_doc, q_data, number)
+
+    final_doc.add_page_break()
+    final_doc.add_heading("Answer Key (For Teacher's Use)", level=1)
+    for number, q_data in enumerate(question_list, start=1):
+        p_answer_header = final_doc.add_paragraph()
+        p_answer_header.add_run(f"Question {number}:").bold = True
+        for i, pair in enumerate(q_data.get("qa_pairs") or []):
+            final_doc.add_paragraph(f"{i+1}. {pair.get('answer', '')}")
+        final_doc.add_paragraph()
+
+    doc_io = io.BytesIO()
+    final_doc.save(doc_io)
+    return doc_io
+
+
+def measure(render, selections: list) -> dict:
+    timings = []
+    sizes = []
+    for question_list in selections:
+        start = time.perf_counter()
+        doc_io = render(question_list)
+        timings.append(time.perf_counter() - start)
+        sizes.append(len(doc_io.getvalue()))
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "size_bytes": int(statistics.mean(sizes)),
+    }
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Compares per-exam render time and output size.")
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    parser.add_argument("--book", default="ELEMENTARY")
+    parser.add_argument("--grammar", type=int, default=25)
+    parser.add_argument("--vocabulary", type=int, default=25)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    book_index = load_book_index(args.book, args.books_dir)
+    parsed_units = book_index["units"]
+    units = [f"{num}{alpha}" for num, alphas in parsed_units.items() for alpha in alphas or [""]]
+    questions_config = {"grammar": args.grammar, "vocabulary": args.vocabulary}
+    pool_by_section = build_question_pool(args.book, units, questions_config, args.books_dir)
+    rng = random.Random(args.seed)
+    selections = [load_questions(book_index, select_questions(pool_by_section, questions_config, rng))
+                  for _ in range(args.iterations)]
+
+    # Aquecimento: template base, imports e caches do lxml fora da medição
+    render_exam_docx(args.book, units, selections[0])
+    legacy_render(args.book, selections[0])
+
+    results = {
+        "legacy": measure(lambda q: legacy_render(args.book, q), selections),
+        "template": measure(lambda q: render_exam_docx(args.book, units, q), selections),
+    }
+    print(f"{len(selections[0])} questions per exam, {args.iterations} exams")
+    for name, result in results.items():
+        print(f"{name:>10}: mean {result['mean_ms']:8.2f} ms | median {result['median_ms']:8.2f} ms | {result['size_bytes']} bytes")
+    speedup = results["legacy"]["mean_ms"] / results["template"]["mean_ms"]
+    print(f"   speedup: {speedup:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
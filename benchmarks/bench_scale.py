@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# O cache compilado dos livros sintéticos não deve se misturar com o .cache/ do projeto
+os.environ.setdefault("CCB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ccb-bench-cache"))
+
+import question_bank
+from exam_generator import generate_exam
+from exam_jobs import JobQueue, submit_exam
+from question_bank import INDEX_CACHE_DIR, load_book_index
+from synthetic_books import generate_books
+
+# --- Scale Benchmark: synthetic banks of production size ---
+#
+# Mede o tempo de compilação do índice (frio, a partir do disco e em memória), a
+# latência por prova, a vazão com provas concorrentes na fila de jobs e o pico de
+# memória. Os resultados são salvos em JSON para comparar versões:
+#
+#   python benchmarks/bench_scale.py --books 20 --units 12 --output before.json
+#   python benchmarks/bench_scale.py --books 20 --units 12 --compare before.json
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _forget_indexes(drop_disk_cache: bool):
+    question_bank._memory_indexes.clear()
+    if drop_disk_cache:
+        shutil.rmtree(INDEX_CACHE_DIR, ignore_errors=True)
+
+
+def bench_index_build(books_dir: str, books: list) -> dict:
+    """Cold build (parse every JSON file), warm load (pickled index on disk) and the in-memory lookup."""
+    timings = {}
+    for phase, drop_memory, drop_disk in (("cold", True, True), ("disk", True, False), ("memory", False, False)):
+        if drop_memory:
+            _forget_indexes(drop_disk)
+        start = time.perf_counter()
+        for book in books:
+            load_book_index(book, books_dir)["units"]
+        timings[phase] = time.perf_counter() - start
+    return {
+        "cold_total_s": timings["cold"],
+        "cold_per_book_ms": timings["cold"] / len(books) * 1000,
+        "disk_per_book_ms": timings["disk"] / len(books) * 1000,
+        "memory_per_book_ms": timings["memory"] / len(books) * 1000,
+    }
+
+
+def bench_peak_memory(books_dir: str, books: list) -> dict:
+    """Peak Python allocations of a cold build of every book (tracemalloc, measured separately)."""
+    _forget_indexes(drop_disk_cache=True)
+    tracemalloc.start()
+    for book in books:
+        load_book_index(book, books_dir)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"index_build_peak_mb": peak / 2 ** 20}
+
+
+def _exam_request(rng: random.Random, books_dir: str, books: list, grammar: int, vocabulary: int) -> tuple:
+    book = rng.choice(books)
+    parsed_units = load_book_index(book, books_dir)["units"]
+    numeric_units = rng.sample(sorted(parsed_units, key=int), min(3, len(parsed_units)))
+    units = [f"{num}{alpha}" for num in numeric_units for alpha in parsed_units[num]]
+    return book, units, {"grammar": grammar, "vocabulary": vocabulary}, rng.randrange(10 ** 9)
+
+
+def bench_latency(books_dir: str, books: list, exams: int, grammar: int, vocabulary: int, seed: int) -> dict:
+    """Sequential generate_exam calls with distinct seeds (so that EXAM_CACHE never hits)."""
+    rng = random.Random(seed)
+    requests = [_exam_request(rng, books_dir, books, grammar, vocabulary) for _ in range(exams)]
+    generate_exam(*requests[0][:3], seed=requests[0][3], books_dir=books_dir)  # aquecimento do template
+    timings = []
+    for book, units, config, exam_seed in requests:
+        start = time.perf_counter()
+        generate_exam(book, units, config, seed=exam_seed + 1, books_dir=books_dir)
+        timings.append(time.perf_counter() - start)
+    return {
+        "exams": exams,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": _percentile(timings, 0.5) * 1000,
+        "p95_ms": _percentile(timings, 0.95) * 1000,
+        "max_ms": max(timings) * 1000,
+    }
+
+
+def bench_throughput(books_dir: str, books: list, exams: int, workers: int, use_processes: bool,
+                     grammar: int, vocabulary: int, seed: int) -> dict:
+    """Exams per second through the background JobQueue with `workers` concurrent jobs."""
+    rng = random.Random(seed)
+    requests = [_exam_request(rng, books_dir, books, grammar, vocabulary) for _ in range(exams)]
+    queue = JobQueue(max_workers=workers, max_pending=exams, use_processes=use_processes)
+    try:
+        start = time.perf_counter()
+        job_ids = [submit_exam(queue, book, units, config, seed=exam_seed, books_dir=books_dir)
+                   for book, units, config, exam_seed in requests]
+        for job_id in job_ids:
+            queue.wait(job_id)
+        elapsed = time.perf_counter() - start
+    finally:
+        queue.shutdown()
+    return {"workers": workers, "exams": exams, "elapsed_s": elapsed, "exams_per_s": exams / elapsed}
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, list):
+            for item in value:
+                flat.update(_flatten(item, f"{name}[{item.get('workers')}]."))
+        elif isinstance(value, (int, float)) and key not in ("workers", "exams"):
+            flat[name] = value
+    return flat
+
+
+def print_comparison(previous: dict, current: dict):
+    before = _flatten(previous["results"])
+    after = _flatten(current["results"])
+    print(f"\ncompared with {previous.get('revision')} ({previous.get('timestamp')}):")
+    for name, value in after.items():
+        if name in before and before[name]:
+            change = (value - before[name]) / before[name] * 100
+            print(f"  {name:<40} {before[name]:12.3f} -> {value:12.3f} ({change:+6.1f}%)")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks index build, exam latency, throughput and memory "
+                                                 "on synthetic books.")
+    parser.add_argument("--books-dir", help="Existing synthetic books; by default they are generated in a temp dir.")
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--units", type=int, default=12)
+    parser.add_argument("--files-per-unit", type=int, default=6)
+    parser.add_argument("--questions-per-file", type=int, default=7)
+    parser.add_argument("--grammar", type=int, default=5)
+    parser.add_argument("--vocabulary", type=int, default=5)
+    parser.add_argument("--exams", type=int, default=50, help="Exams per latency/throughput measurement.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<git revision>.json).")
+    parser.add_argument("--compare", help="Previous results file to compare against.")
+    args = parser.parse_args(argv)
+
+    books_dir = args.books_dir
+    generated_dir = None
+    if books_dir is None:
+        generated_dir = books_dir = tempfile.mkdtemp(prefix="ccb-books-")
+        generate_books(books_dir, args.books, args.units, args.files_per_unit, args.questions_per_file, args.seed)
+    books = sorted(question_bank.list_books(books_dir))
+
+    try:
+        results = {"index_build": bench_index_build(books_dir, books)}
+        total_questions = sum(len(entry["questions"]) for book in books
+                              for entry in load_book_index(book, books_dir)["files"].values())
+        results["memory"] = bench_peak_memory(books_dir, books)
+        results["latency"] = bench_latency(books_dir, books, args.exams, args.grammar, args.vocabulary, args.seed)
+        results["throughput"] = [
+            bench_throughput(books_dir, books, args.exams, workers, args.executor == "process",
+                             args.grammar, args.vocabulary, args.seed + workers)
+            for workers in args.workers
+        ]
+        results["memory"]["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    finally:
+        if generated_dir is not None:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {"books": len(books), "questions": total_questions, "grammar": args.grammar,
+                   "vocabulary": args.vocabulary, "exams": args.exams, "executor": args.executor},
+        "results": results,
+    }
+
+    index_build = results["index_build"]
+    latency = results["latency"]
+    print(f"{len(books)} books, {total_questions} questions")
+    print(f"index build: cold {index_build['cold_total_s']:.2f} s ({index_build['cold_per_book_ms']:.1f} ms/book) | "
+          f"from disk {index_build['disk_per_book_ms']:.2f} ms/book | in memory {index_build['memory_per_book_ms']:.3f} ms/book")
+    print(f"latency: mean {latency['mean_ms']:.1f} ms | p50 {latency['p50_ms']:.1f} ms | p95 {latency['p95_ms']:.1f} ms")
+    for result in results["throughput"]:
+        print(f"throughput ({args.executor}, {result['workers']} workers): {result['exams_per_s']:.1f} exams/s")
+    print(f"memory: index build peak {results['memory']['index_build_peak_mb']:.1f} MB | "
+          f"max RSS {results['memory']['max_rss_mb']:.1f} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+# --- Synthetic Question Banks ---
+#
+# Gera livros falsos com o mesmo layout de BOOKS/ (UNIT-n/UNIDADE-n-QUESTAO-m-SECTION.json)
+# para medir o comportamento com bancos do tamanho dos que usamos em produção:
+#
+#   python benchmarks/synthetic_books.py /tmp/ccb-books --books 20 --units 12 --files-per-unit 6 --questions-per-file 7
+
+SECTIONS = ["GRAMMAR", "VOCABULARY"]
+SUB_UNITS = "ABC"
+QUESTION_TYPES = [
+    "fill_in_the_blanks_one_word", "select_correct_word", "underline_correct_word_or_phrase", "short_answer",
+    "tick_correct_sentence", "match_question_answer", "order_the_words_to_make_a_question",
+    "fill_in_from_word_bank", "create_sentence_from_prompts",
+]
+WORDS = ("book teacher student happy city travel morning friend coffee office market weekend "
+         "river music window family kitchen garden summer language holiday station doctor").split()
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(length)]
+    words.insert(rng.randrange(len(words)), "_______")
+    return " ".join(words).capitalize() + "."
+
+
+def make_question(rng: random.Random, question_id: int, section: str, unit: int) -> dict:
+    """A question with the fields and sizes of the real ones (5-8 items, 1-2 topics)."""
+    q_type = rng.choice(QUESTION_TYPES)
+    topics = sorted(rng.sample([f"{unit}{alpha}" for alpha in SUB_UNITS], rng.randint(1, 2)))
+    qa_pairs = []
+    for _ in range(rng.randint(5, 8)):
+        if q_type == "tick_correct_sentence":
+            item = f"A {_sentence(rng, 5)} / B {_sentence(rng, 5)}"
+        elif q_type.startswith("underline"):
+            item = _sentence(rng, 6).replace("_______", f"{rng.choice(WORDS)}/{rng.choice(WORDS)}")
+        else:
+            item = _sentence(rng, rng.randint(5, 10))
+        qa_pairs.append({"item": item, "answer": rng.choice(WORDS)})
+    question = {
+        "id": question_id,
+        "section": section,
+        "topic": topics,
+        "instructions": f"{rng.choice(['Complete', 'Choose', 'Match', 'Write'])} the sentences about {rng.choice(WORDS)}.",
+        "example": {"item": _sentence(rng, 6), "answer": rng.choice(WORDS)},
+        "type": q_type,
+        "qa_pairs": qa_pairs,
+    }
+    if q_type == "fill_in_from_word_bank":
+        question["options"] = [pair["answer"] for pair in qa_pairs]
+    return question
+
+
+def generate_book(book_path: str, units: int, files_per_unit: int, questions_per_file: int, seed: int = 0) -> int:
+    """Writes one synthetic book and returns its number of questions."""
+    rng = random.Random(seed)
+    total = 0
+    for unit in range(1, units + 1):
+        unit_dir = os.path.join(book_path, f"UNIT-{unit}")
+        os.makedirs(unit_dir, exist_ok=True)
+        for file_number in range(1, files_per_unit + 1):
+            section = SECTIONS[(file_number - 1) * len(SECTIONS) // files_per_unit]
+            questions = [make_question(rng, total + i + 1, section, unit) for i in range(questions_per_file)]
+            total += len(questions)
+            filename = f"UNIDADE-{unit}-QUESTAO-{file_number}-{section}.json"
+            with open(os.path.join(unit_dir, filename), 'w', encoding='utf-8') as f:
+                json.dump({"questions": questions}, f, ensure_ascii=False, indent=2)
+    return total
+
+
+def generate_books(books_dir: str, books: int, units: int, files_per_unit: int, questions_per_file: int,
+                   seed: int = 0) -> list:
+    """Writes `books` synthetic books (SYNTH-01, SYNTH-02, ...) and returns their names."""
+    names = []
+    for i in range(books):
+        name = f"SYNTH-{i + 1:02d}"
+        generate_book(os.path.join(books_dir, name), units, files_per_unit, questions_per_file, seed + i)
+        names.append(name)
+    return names
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Generates synthetic books in the BOOKS/ layout.")
+    parser.add_argument("books_dir")
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--units", type=int, default=12)
+    parser.add_argument("--files-per-unit", type=int, default=6)
+    parser.add_argument("--questions-per-file", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = generate_books(args.books_dir, args.books, args.units, args.files_per_unit, args.questions_per_file, args.seed)
+    per_book = args.units * args.files_per_unit * args.questions_per_file
+    print(f"{len(names)} books, {per_book} questions each ({per_book * len(names)} in total) in {args.books_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import argparse
+import os
+import sys
+import metrics
+from question_bank import BOOKS_DIR, list_books, load_book_index
+from exam_generator import (EXAM_PARTS, OUTPUT_FORMATS, SAMPLER_VERSION, batch_exam_ids, choose_seed,
+                            exam_id_request, expand_units, format_units_display, generate_exam, generate_exam_batch,
+                            new_seed, parse_exam_id, questions_of_exams, write_answer_key_booklet)
+from exam_jobs import JobQueue, submit_exam
+from i18n import LANGUAGES, DEFAULT_LANG, translate
+
+# --- Headless Command-Line Entry Point ---
+#
+# Gera provas sem importar o Streamlit, para uso em cron jobs e workers:
+#   python cli.py --book ELEMENTARY --units 1 2 --grammar 3 --vocabulary 3 --seed 42 -o prova.docx
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generates English tests from the JSON question bank.")
+    parser.add_argument("--books-dir", default=BOOKS_DIR, help="Root directory of the question bank.")
+    parser.add_argument("--list-books", action="store_true", help="List the available books and exit.")
+    parser.add_argument("--list-units", action="store_true", help="List the units of --book and exit.")
+    parser.add_argument("--book", help="Book name (e.g. ELEMENTARY).")
+    parser.add_argument("--units", nargs="+", help="Units ('1', '2') or sub-units ('1A', '2C'). Defaults to all units.")
+    parser.add_argument("--grammar", type=int, default=3, help="Number of grammar questions.")
+    parser.add_argument("--vocabulary", type=int, default=3, help="Number of vocabulary questions.")
+    parser.add_argument("--lang", default=DEFAULT_LANG, choices=sorted(LANGUAGES), help="Language of the document.")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible question selection.")
+    parser.add_argument("--exam-id", nargs="+", help="Regenerates the exams printed with these IDs (overrides book, "
+                                                     "units and counts). Several IDs are generated in parallel into "
+                                                     "the --output directory.")
+    parser.add_argument("--avoid-exam", nargs="+", default=[], metavar="EXAM_ID",
+                        help="Without --seed, draw an exam that repeats as few questions of these exams as possible.")
+    parser.add_argument("--variants", type=int, default=1, help="Number of versions; more than one writes a .zip.")
+    parser.add_argument("--format", default="docx", choices=sorted(OUTPUT_FORMATS), help="Document format.")
+    parser.add_argument("--part", default="full", choices=EXAM_PARTS,
+                        help="full: test and answer key; student: test only; key: answer key only (no question "
+                             "rendering); split: test and answer key as separate files in a .zip.")
+    parser.add_argument("--answer-key-booklet", action="store_true", help="Write every question of --book with its "
+                                                                          "answers (streamed straight to the file).")
+    parser.add_argument("-o", "--output", help="Output file. Defaults to the translated file name.")
+    parser.add_argument("--metrics", action="store_true", help="Log the timing of each stage and print the "
+                                                                 "counters (Prometheus text format) to stderr.")
+    return parser
+
+
+def generate_from_exam_ids(exam_ids: list, output_dir: str, lang: str, books_dir: str, output_format: str = "docx",
+                           part: str = "full") -> int:
+    """Regenerates several exams through the background job queue, one document per exam ID."""
+    try:
+        exam_params = [parse_exam_id(exam_id) for exam_id in exam_ids]
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    os.makedirs(output_dir, exist_ok=True)
+    job_queue = JobQueue(max_pending=len(exam_ids))
+    jobs = []
+    for exam_id, params in zip(exam_ids, exam_params):
+        job_id = submit_exam(job_queue, params["book"], params["units"], params["questions_config"],
+                             lang=lang, seed=params["seed"], books_dir=books_dir, output_format=output_format,
+                             part=part, sampler=params["sampler"], variant=params["variant"])
+        jobs.append((exam_id, job_id))
+
+    exit_code = 0
+    for exam_id, job_id in jobs:
+        try:
+            document_bytes = job_queue.wait(job_id)
+        except Exception as e:
+            print(translate("err_generation", lang).format(error=e), file=sys.stderr)
+            exit_code = 1
+            continue
+        extension = "zip" if part == "split" else output_format
+        suffix = "-key" if part == "key" else ""
+        output = os.path.join(output_dir, f"{exam_id}{suffix}.{extension}")
+        with open(output, 'wb') as f:
+            f.write(document_bytes)
+        print(output)
+    job_queue.shutdown()
+    return exit_code
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.metrics:
+        metrics.set_enabled(True)
+    exit_code = run(args)
+    if args.metrics:
+        sys.stderr.write(metrics.render_prometheus())
+    return exit_code
+
+
+def run(args: argparse.Namespace) -> int:
+
+    if args.exam_id and len(args.exam_id) > 1:
+        return generate_from_exam_ids(args.exam_id, args.output or ".", args.lang, args.books_dir, args.format,
+                                      args.part)
+
+    sampler, variant = SAMPLER_VERSION, None
+    if args.exam_id:
+        try:
+            exam_params = exam_id_request(args.exam_id[0], args.variants)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        args.book = exam_params["book"]
+        args.units = exam_params["units"]
+        args.grammar = exam_params["questions_config"].get("grammar", 0)
+        args.vocabulary = exam_params["questions_config"].get("vocabulary", 0)
+        args.seed = exam_params["seed"]
+        args.variants = exam_params["variants"]
+        sampler = exam_params["sampler"]
+        variant = exam_params["variant"]
+
+    if args.list_books:
+        print("\n".join(sorted(list_books(args.books_dir))))
+        return 0
+
+    if not args.book:
+        print("error: --book is required", file=sys.stderr)
+        return 2
+    if args.book not in list_books(args.books_dir):
+        print(f"error: book '{args.book}' not found in '{args.books_dir}'", file=sys.stderr)
+        return 1
+
+    parsed_units = load_book_index(args.book, args.books_dir)["units"]
+    if not parsed_units:
+        print(translate("err_no_units", args.lang).format(args.book), file=sys.stderr)
+        return 1
+
+    if args.list_units:
+        for num_unit in sorted(parsed_units, key=int):
+            print(f"{num_unit}: {', '.join(f'{num_unit}{alpha}' for alpha in parsed_units[num_unit])}")
+        return 0
+
+    if args.answer_key_booklet:
+        output = args.output or translate("filename_booklet", args.lang).format(book=args.book)
+        with open(output, 'wb') as f:
+            write_answer_key_booklet(f, args.book, lang=args.lang, books_dir=args.books_dir)
+        print(output)
+        return 0
+
+    numeric_units = args.units or sorted(parsed_units, key=int)
+    units = expand_units(parsed_units, numeric_units)
+    questions_config = {"grammar": args.grammar, "vocabulary": args.vocabulary}
+    if sum(questions_config.values()) == 0:
+        print(translate("warn_no_questions_selected", args.lang), file=sys.stderr)
+        return 2
+
+    units_filename = format_units_display(units).replace(", ", "_")
+    if args.seed is not None:
+        seed = args.seed
+    elif args.avoid_exam and args.variants == 1:
+        seed = choose_seed(args.book, units, questions_config, questions_of_exams(args.avoid_exam, args.books_dir),
+                           args.books_dir)
+    else:
+        seed = new_seed()
+    if args.variants > 1:
+        exam_io = generate_exam_batch(args.book, units, questions_config, args.variants, lang=args.lang, seed=seed,
+                                      books_dir=args.books_dir, output_format=args.format, part=args.part,
+                                      sampler=sampler)
+        output = args.output or translate("filename_batch", args.lang).format(book=args.book, units=units_filename)
+    else:
+        exam_io = generate_exam(args.book, units, questions_config, lang=args.lang, seed=seed,
+                                books_dir=args.books_dir, output_format=args.format, part=args.part,
+                                sampler=sampler, variant=variant)[1]
+        if args.part == "split":
+            output = args.output or translate("filename_split", args.lang).format(book=args.book, units=units_filename)
+        else:
+            filename_key = "filename_answer_key" if args.part == "key" else "filename_test"
+            output = args.output or translate(filename_key, args.lang).format(book=args.book, units=units_filename,
+                                                                               ext=args.format)
+
+    with open(output, 'wb') as f:
+        f.write(exam_io.getvalue())
+    print(output)
+    for exam_id in batch_exam_ids(args.book, units, questions_config, seed, args.variants, sampler, variant):
+        print(translate("docx_exam_id", args.lang).format(exam_id=exam_id), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
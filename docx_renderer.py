@@ -0,0 +1,222 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from xml.sax.saxutils import escape
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from metrics import stage
+
+# --- Template-Based DOCX Rendering Engine ---
+#
+# O documento base (fonte, estilos de parágrafo e espaçamento) é montado uma única
+# vez por processo; as provas são escritas a partir dele por docx_stream.py. As questões
+# são descritas como uma lista de linhas (estilo, texto) e escritas direto em XML, sem
+# parágrafos vazios para espaçamento: o espaço entre blocos vem do estilo.
+
+BASE_TEMPLATE_PATH = os.environ.get("CCB_DOCX_TEMPLATE")
+BLOCK_SPACING = Pt(12)
+
+# key: (style name, bold, space after)
+PARAGRAPH_STYLES = {
+    "line": ("Exam Line", False, Pt(0)),
+    "line_spaced": ("Exam Line Spaced", False, BLOCK_SPACING),
+    "bold": ("Exam Bold", True, Pt(0)),
+    "bold_spaced": ("Exam Bold Spaced", True, BLOCK_SPACING),
+}
+HEADING_STYLES = {"title": "Title", "heading": "Heading 1"}
+SPACED_STYLE = {"line": "line_spaced", "bold": "bold_spaced"}
+PAGE_BREAK = ("page_break", None)
+_CONTROL_CHARS = re.compile(r"(\t|\r\n|\n|\r)")
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_base_template = None
+_template_identity = None
+_template_lock = threading.Lock()
+
+
+def _build_base_template() -> dict:
+    """Builds the base document once and returns its bytes and the style ids used by the lines."""
+    document = Document(BASE_TEMPLATE_PATH) if BASE_TEMPLATE_PATH else Document()
+    normal = document.styles['Normal']
+    normal.font.name = 'Calibri'
+    normal.font.size = Pt(11)
+
+    style_ids = {}
+    for key, (name, bold, space_after) in PARAGRAPH_STYLES.items():
+        names = [s.name for s in document.styles]
+        style = document.styles[name] if name in names else document.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = normal
+        style.font.bold = bold
+        style.paragraph_format.space_before = Pt(0)
+        style.paragraph_format.space_after = space_after
+        style_ids[key] = style.style_id
+    for key, name in HEADING_STYLES.items():
+        style_ids[key] = document.styles[name].style_id
+
+    # Remove o parágrafo vazio que o template padrão traz no corpo
+    body = document.element.body
+    for p in body.findall(qn('w:p')):
+        body.remove(p)
+
+    template_io = io.BytesIO()
+    document.save(template_io)
+    return {"bytes": template_io.getvalue(), "style_ids": style_ids}
+
+
+def template_identity() -> str:
+    """Short hash of the CCB_DOCX_TEMPLATE file ('default' without one), for the keys of cached documents."""
+    global _template_identity
+    if _template_identity is None:
+        if BASE_TEMPLATE_PATH:
+            with open(BASE_TEMPLATE_PATH, 'rb') as f:
+                _template_identity = hashlib.sha1(f.read()).hexdigest()[:12]
+        else:
+            _template_identity = "default"
+    return _template_identity
+
+
+def get_base_template() -> dict:
+    global _base_template
+    if _base_template is None:
+        with _template_lock:
+            if _base_template is None:
+                with stage("build_template"):
+                    _base_template = _build_base_template()
+    return _base_template
+
+
+def with_spacing(lines: list) -> list:
+    """Makes the last line of a block carry the block spacing (instead of an empty paragraph)."""
+    if lines:
+        style_key, text = lines[-1]
+        lines[-1] = (SPACED_STYLE.get(style_key, style_key), text)
+    return lines
+
+
+def paragraph_xml(style_id: str, text: str) -> str:
+    """
+    Builds the XML of a <w:p> with a paragraph style and a single run. As in python-docx,
+    line feeds become <w:br/> and tabs become <w:tab/>.
+    """
+    runs = ""
+    if text:
+        for i, segment in enumerate(_CONTROL_CHARS.split(_INVALID_XML_CHARS.sub("", text))):
+            if i % 2:
+                runs += "<w:tab/>" if segment == '\t' else "<w:br/>"
+            elif segment:
+                space = ' xml:space="preserve"' if segment != segment.strip() else ""
+                runs += f"<w:t{space}>{escape(segment)}</w:t>"
+        runs = f"<w:r>{runs}</w:r>"
+    return f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>{runs}</w:p>'
+
+
+PAGE_BREAK_XML = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def lines_xml(lines: list) -> bytes:
+    """Converts (style, text) lines into the XML of their <w:p> elements."""
+    style_ids = get_base_template()["style_ids"]
+    return "".join(PAGE_BREAK_XML if style_key == PAGE_BREAK[0] else paragraph_xml(style_ids[style_key], text)
+                   for style_key, text in lines).encode('utf-8')
+
+
+def question_header_line(question_data: dict, question_number: int) -> tuple:
+    """The numbered instructions line of a question."""
+    return ("bold_spaced", f"{question_number}. {question_data.get('instructions', '')}")
+
+
+def question_lines(question_data: dict, question_number: int) -> list:
+    """
+    Describes a single question as (style, text) lines, based on its type.
+    """
+    return [question_header_line(question_data, question_number)] + question_body_lines(question_data)
+
+
+def question_body_lines(question_data: dict) -> list:
+    """
+    Describes everything below the instructions line of a question. These lines do
+    not depend on the question number, so they can be rendered once and reused.
+    """
+    q_type = question_data.get("type") or ""
+    lines = []
+
+    # Example if it exists
+    example_data = question_data.get("example")
+    if isinstance(example_data, dict):
+        example_item = example_data.get("item", "")
+        lines.append(("line", f"Example: {example_item}"))
+    elif isinstance(example_data, str):
+        lines.append(("line", f"Example: {example_data}"))
+
+    qa_pairs = question_data.get("qa_pairs") or question_data.get("qa_pair", [])
+
+    # --- 2. Conditional Formatting based on Question Type ---
+
+    # Type A: Tick/Select Sentence (A/B comparison, elimina quebra de linha)
+    if q_type in ["tick_correct_sentence", "select_correct_sentence"]:
+        for i, pair in enumerate(qa_pairs):
+            item_text = pair.get("item", "")
+            options = item_text.split(' / ')
+            options_text_list = []
+
+            for j, option in enumerate(options):
+                if j == 0 and re.match(r"^[A-D]\s", option):
+                    options_text_list.append(f"( ) {option}")
+                else:
+                    options_text_list.append(option)
+
+            lines.append(("line_spaced", f"{i+1}. {' '.join(options_text_list)}"))
+
+    # Type B: Underline/Select Word
+    elif q_type.startswith(("underline_correct_word", "select_correct_possessive_adjective",
+                            "underline_correct_word_subject_possessive", "underline_correct_word_or_phrase")):
+        for i, pair in enumerate(qa_pairs):
+            item_text = pair.get("item", "")
+            display_text = item_text.replace('/', ' / ')
+            lines.append(("line_spaced", f"{i+1}. {display_text}"))
+
+    # Type C: Fill-in, Completion, Ordering, Generic
+    elif qa_pairs:
+        if q_type == "fill_in_from_word_bank":
+            options = question_data.get("options", [])
+            if options:
+                lines.append(("line", f"Options: {', '.join(options)}"))
+
+        if q_type == "match_question_answer":
+            lines.append(("line", "Match the questions and answers:"))
+
+        for i, pair in enumerate(qa_pairs):
+            item_text = pair.get("item", "")
+            if q_type == "match_question_answer":
+                lines.append(("line", f"({i+1}) {item_text}"))
+                lines.append(("line", "------------------------------------"))
+            elif q_type.startswith("order_the_words") or q_type.startswith("create_sentence"):
+                lines.append(("line", f"{i+1}. Prompts: {item_text}"))
+                lines.append(("line", "____________________________________________________________________"))
+            else:
+                lines.append(("line", f"{i+1}. {item_text}"))
+        with_spacing(lines)  # Espaçamento final
+
+    return lines
+
+
+def answer_header_line(header: str, question_number: int, has_answers: bool) -> tuple:
+    """The 'Question N:' line of the answer key; it carries the spacing when there are no answers."""
+    return ("bold" if has_answers else "bold_spaced", header.format(number=question_number))
+
+
+def answer_body_lines(question_data: dict) -> list:
+    """Describes the answers of a question as (style, text) lines."""
+    answers_source = question_data.get("qa_pairs") or question_data.get("qa_pair", [])
+    lines = [("line", f"{i+1}. {pair.get('answer', '')}") for i, pair in enumerate(answers_source)]
+    return with_spacing(lines)
+
+
+def answer_key_lines(question_data: dict, question_number: int, header: str) -> list:
+    """Describes the answer key entry of a question as (style, text) lines."""
+    body = answer_body_lines(question_data)
+    return [answer_header_line(header, question_number, bool(body))] + body
@@ -0,0 +1,193 @@
+import io
+import struct
+import threading
+import zipfile
+import zlib
+from docx_renderer import get_base_template
+
+# --- Streaming DOCX Writer ---
+#
+# Escreve o .docx direto na saída (arquivo, BytesIO ou resposta em partes) sem montar
+# a árvore do python-docx: as partes fixas do template (estilos, tema, etc.) são
+# comprimidas uma única vez por processo e copiadas como estão, e o word/document.xml
+# é comprimido à medida que os fragmentos XML das questões chegam. A memória usada
+# não cresce com o tamanho da prova.
+#
+# O ZIP é montado aqui mesmo (o zipfile não copia entradas já comprimidas); a entrada
+# do document.xml usa um "data descriptor", pois o CRC e o tamanho só são conhecidos no fim.
+
+DOCUMENT_PART = "word/document.xml"
+COMPRESS_LEVEL = 6
+
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+_DATA_DESCRIPTOR = struct.Struct("<4s3I")
+_CENTRAL_HEADER = struct.Struct("<4s6H3I5H2I")
+_END_RECORD = struct.Struct("<4s4H2IH")
+_FLAG_UTF8 = 0x800
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+_stream_template = None
+_stream_template_lock = threading.Lock()
+
+
+def _dos_timestamp(date_time: tuple) -> tuple:
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _local_header(name: bytes, flags: int, dos_time: int, dos_date: int, crc: int, compressed_size: int,
+                  size: int) -> bytes:
+    return _LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                              crc, compressed_size, size, len(name), 0) + name
+
+
+def _build_stream_template() -> dict:
+    """
+    Splits the base template into the compressed fixed parts (written verbatim) and
+    the document.xml before and after the body content.
+    """
+    template = zipfile.ZipFile(io.BytesIO(get_base_template()["bytes"]))
+    document_xml = template.read(DOCUMENT_PART)
+    body_end = document_xml.index(b"<w:sectPr")
+    date_time = template.getinfo(DOCUMENT_PART).date_time
+    dos_time, dos_date = _dos_timestamp(date_time)
+
+    prefix = bytearray()
+    entries = []
+    for info in template.infolist():
+        if info.filename == DOCUMENT_PART:
+            continue
+        data = template.read(info.filename)
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        name = info.filename.encode('utf-8')
+        crc = zlib.crc32(data)
+        entries.append({"name": name, "flags": _FLAG_UTF8, "crc": crc, "compressed_size": len(compressed),
+                        "size": len(data), "offset": len(prefix)})
+        prefix += _local_header(name, _FLAG_UTF8, dos_time, dos_date, crc, len(compressed), len(data))
+        prefix += compressed
+
+    return {
+        "prefix": bytes(prefix),
+        "entries": entries,
+        "dos_time": dos_time,
+        "dos_date": dos_date,
+        "document_head": document_xml[:body_end],
+        "document_tail": document_xml[body_end:],
+    }
+
+
+def get_stream_template() -> dict:
+    global _stream_template
+    if _stream_template is None:
+        with _stream_template_lock:
+            if _stream_template is None:
+                _stream_template = _build_stream_template()
+    return _stream_template
+
+
+class DocxStreamWriter:
+    """
+    Writes a .docx to `output` (anything with a write(bytes) method) as the body XML
+    arrives. Use write_xml() with serialized <w:p> elements and close() at the end.
+    """
+
+    def __init__(self, output):
+        self._output = output
+        self._template = get_stream_template()
+        self._offset = 0
+        self._crc = 0
+        self._size = 0
+        self._compressed_size = 0
+        self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        self._closed = False
+
+        self._emit(self._template["prefix"])
+        self._document_offset = self._offset
+        self._emit(_local_header(DOCUMENT_PART.encode('utf-8'), _FLAG_UTF8 | _FLAG_DATA_DESCRIPTOR,
+                                 self._template["dos_time"], self._template["dos_date"], 0, 0, 0))
+        self.write_xml(self._template["document_head"])
+
+    def _emit(self, data: bytes):
+        if data:
+            self._output.write(data)
+            self._offset += len(data)
+
+    def write_xml(self, xml: bytes):
+        """Appends raw XML to word/document.xml (e.g. a cached question fragment)."""
+        if not xml:
+            return
+        self._crc = zlib.crc32(xml, self._crc)
+        self._size += len(xml)
+        compressed = self._compressor.compress(xml)
+        self._compressed_size += len(compressed)
+        self._emit(compressed)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.write_xml(self._template["document_tail"])
+        compressed = self._compressor.flush()
+        self._compressed_size += len(compressed)
+        self._emit(compressed)
+        self._emit(_DATA_DESCRIPTOR.pack(b"PK\x07\x08", self._crc, self._compressed_size, self._size))
+
+        entries = self._template["entries"] + [{
+            "name": DOCUMENT_PART.encode('utf-8'), "flags": _FLAG_UTF8 | _FLAG_DATA_DESCRIPTOR, "crc": self._crc,
+            "compressed_size": self._compressed_size, "size": self._size, "offset": self._document_offset,
+        }]
+        central_directory_offset = self._offset
+        for entry in entries:
+            self._emit(_CENTRAL_HEADER.pack(
+                b"PK\x01\x02", 20, 20, entry["flags"], zipfile.ZIP_DEFLATED,
+                self._template["dos_time"], self._template["dos_date"], entry["crc"], entry["compressed_size"],
+                entry["size"], len(entry["name"]), 0, 0, 0, 0, 0, entry["offset"]) + entry["name"])
+        self._emit(_END_RECORD.pack(b"PK\x05\x06", 0, 0, len(entries), len(entries),
+                                    self._offset - central_directory_offset, central_directory_offset, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+class _ChunkSink:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data: bytes):
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_docx(xml_fragments, chunk_size: int = 64 * 1024):
+    """
+    Streams a .docx built from an iterable of body XML fragments, yielding chunks of
+    about chunk_size bytes (e.g. for a chunked HTTP response).
+    """
+    sink = _ChunkSink()
+    writer = DocxStreamWriter(sink)
+    for xml in xml_fragments:
+        writer.write_xml(xml)
+        if sink.size >= chunk_size:
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def write_docx(output, xml_fragments):
+    """Writes a .docx built from an iterable of body XML fragments to `output`."""
+    with DocxStreamWriter(output) as writer:
+        for xml in xml_fragments:
+            writer.write_xml(xml)
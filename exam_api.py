@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import sys
+from urllib.parse import parse_qs, unquote
+from bank_watcher import BankWatcher
+from exam_generator import (EXAM_PARTS, OUTPUT_FORMATS, SAMPLER_VERSION, batch_exam_ids, canonical_config,
+                            canonical_units, exam_id_request, expand_units, make_exam_id, new_seed,
+                            stream_answer_key_booklet)
+from exam_jobs import JobQueue, QueueFullError, run_exam_job
+from exam_store import EXAM_STORE
+from i18n import DEFAULT_LANG, LANGUAGES
+from metrics import count, stage
+from question_bank import BOOKS_DIR, list_books, load_book_index
+from search_index import search_questions
+from warmup import WARMUP_ON_START, format_report, warm_up
+
+# --- HTTP Exam-Generation API (ASGI) ---
+#
+# API mínima para integrações (LMS) sem passar pela página do Streamlit. Usa o mesmo
+# núcleo de geração e a mesma fila de jobs da interface; não depende de framework, só
+# de um servidor ASGI (uvicorn, que também mantém as conexões keep-alive):
+#
+#   python exam_api.py --port 8000          # ou: uvicorn exam_api:app --port 8000
+#
+#   GET  /books                              livros disponíveis
+#   GET  /books/<livro>/units                unidades de um livro (do índice compilado)
+#   GET  /books/<livro>/answer-key?lang=     gabarito completo do livro, gerado em streaming
+#   GET  /books/<livro>/search?q=&type=&topic=&section=&limit=   busca nas questões (search_index.py)
+#   GET  /exams/<código>?lang=&format=&part= a prova de um código impresso
+#   POST /exams  {"book", "units", "grammar", "vocabulary", "seed", "lang", "format", "part", "variants"}
+#   GET  /documents/<handle>?filename=       documento gerado pela página, lido do EXAM_STORE
+#
+# Um lote (variants > 1) responde também com X-Exam-Ids: o código "-Vnn" de cada versão.
+#
+# Requisições idênticas simultâneas (mesmo código de prova, idioma, formato e conteúdo)
+# esperam uma única geração. O documento é devolvido em partes de STREAM_CHUNK_SIZE bytes.
+# Leituras de índice e de disco rodam fora do event loop; um BankWatcher iniciado com o
+# servidor mantém os índices em memória atualizados.
+
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_REQUEST_BYTES = 64 * 1024
+MAX_VARIANTS = 60
+MAX_QUESTIONS_PER_SECTION = 50
+ZIP_MIME = "application/zip"
+DOCUMENT_MIMES = dict(OUTPUT_FORMATS, zip=ZIP_MIME)
+_SAFE_FILENAME = re.compile(r"[^\w.\-]+")
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    """An error answered to the client with an HTTP status and a JSON message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(params: dict, name: str, default: int, minimum: int, maximum: int = None) -> int:
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ApiError(400, f"'{name}' must be between {minimum} and {maximum}" if maximum is not None
+                       else f"'{name}' must be at least {minimum}")
+    return value
+
+
+def _choice_param(params: dict, name: str, default: str, choices) -> str:
+    value = params.get(name) or default
+    if value not in choices:
+        raise ApiError(400, f"'{name}' must be one of: {', '.join(choices)}")
+    return value
+
+
+class ExamApi:
+    """
+    ASGI application. Generations go through a JobQueue (bounded: a full queue is
+    answered with 503) and identical requests in flight share the same job.
+    """
+
+    def __init__(self, books_dir: str = BOOKS_DIR, queue: JobQueue = None, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.books_dir = books_dir
+        self.chunk_size = chunk_size
+        self._queue = queue
+        self._inflight = {}
+        self._watcher = None
+
+    @property
+    def queue(self) -> JobQueue:
+        if self._queue is None:
+            self._queue = JobQueue()
+        return self._queue
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            await self._route(scope, receive, send)
+        except ApiError as e:
+            await self._send_json(send, e.status, {"error": str(e)})
+        except QueueFullError as e:
+            await self._send_json(send, 503, {"error": str(e)}, [(b"retry-after", b"5")])
+        except Exception as e:
+            count("api_errors")
+            await self._send_json(send, 500, {"error": f"Exam generation failed: {e}"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._watcher = await self._run_blocking(BankWatcher(self.books_dir).start)
+                if WARMUP_ON_START:
+                    # O servidor só passa a aceitar conexões depois de aquecido
+                    steps = await self._run_blocking(warm_up, self.books_dir)
+                    print(format_report(steps), file=sys.stderr)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._watcher is not None:
+                    await self._run_blocking(self._watcher.stop)
+                    self._watcher = None
+                if self._queue is not None:
+                    self._queue.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _run_blocking(fn, *args, **kwargs):
+        """Runs a blocking call (index build, disk read, search) in the default executor, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    async def _route(self, scope, receive, send):
+        method = scope["method"]
+        parts = [unquote(part) for part in scope["path"].strip("/").split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(scope.get("query_string", b"").decode('latin-1')).items()}
+        count("api_requests")
+
+        if parts == ["books"] and method == "GET":
+            await self._send_json(send, 200, {"books": sorted(await self._run_blocking(list_books, self.books_dir))})
+        elif len(parts) == 3 and parts[0] == "books" and parts[2] == "units" and method == "GET":
+            units = (await self._book_index(parts[1]))["units"]
+            await self._send_json(send, 200, {"book": parts[1], "units": {num: units[num] for num in sorted(units, key=int)}})
+        elif len(parts) == 3 and parts[0] == "books" and parts[2] == "answer-key" and method == "GET":
+            await self._book_index(parts[1])
+            lang = _choice_param(query, "lang", DEFAULT_LANG, LANGUAGES)
+            await self._send_booklet(send, parts[1], lang)
+        elif len(parts) == 3 and parts[0] == "books" and parts[2] == "search" and method == "GET":
+            await self._book_index(parts[1])
+            filters = {name: [value for value in query.get(name, "").split(",") if value]
+                       for name in ("type", "topic", "section")}
+            await self._send_json(send, 200, await self._run_blocking(
+                search_questions, parts[1], query.get("q", ""), types=filters["type"], topics=filters["topic"],
+                sections=filters["section"], limit=_int_param(query, "limit", 50, 0, 500), books_dir=self.books_dir))
+        elif len(parts) == 2 and parts[0] == "exams" and method == "GET":
+            try:
+                params = exam_id_request(parts[1], _int_param(query, "variants", 1, 1, MAX_VARIANTS))
+            except ValueError as e:
+                raise ApiError(400, str(e))
+            params.update({name: value for name, value in query.items() if name in ("lang", "format", "part")})
+            await self._send_exam(send, await self._exam_request(params, from_exam_id=True))
+        elif len(parts) == 2 and parts[0] == "documents" and method == "GET":
+            await self._send_document(send, parts[1], query.get("filename") or f"{parts[1]}.docx")
+        elif parts == ["exams"] and method == "POST":
+            await self._send_exam(send, await self._exam_request(await self._read_json(receive)))
+        elif parts and parts[0] in ("books", "exams", "documents"):
+            raise ApiError(405, f"{method} is not allowed on {scope['path']}")
+        else:
+            raise ApiError(404, f"Not found: {scope['path']}")
+
+    async def _book_index(self, book: str) -> dict:
+        if book not in await self._run_blocking(list_books, self.books_dir):
+            raise ApiError(404, f"Book '{book}' not found")
+        return await self._run_blocking(load_book_index, book, self.books_dir)
+
+    async def _exam_request(self, params: dict, from_exam_id: bool = False) -> dict:
+        """Validates the parameters of an exam and resolves them to the same form the UI uses."""
+        book = params.get("book")
+        if not book:
+            raise ApiError(400, "'book' is required")
+        parsed_units = (await self._book_index(book))["units"]
+        if from_exam_id:
+            units, questions_config = params["units"], params["questions_config"]
+        else:
+            requested_units = params.get("units") or sorted(parsed_units, key=int)
+            if isinstance(requested_units, str):
+                requested_units = [unit.strip() for unit in requested_units.split(",") if unit.strip()]
+            units = expand_units(parsed_units, [str(unit) for unit in requested_units])
+            questions_config = {
+                "grammar": _int_param(params, "grammar", 3, 0, MAX_QUESTIONS_PER_SECTION),
+                "vocabulary": _int_param(params, "vocabulary", 3, 0, MAX_QUESTIONS_PER_SECTION),
+            }
+        known_units = set(expand_units(parsed_units, list(parsed_units)))
+        unknown_units = [unit for unit in units if unit not in known_units]
+        if unknown_units:
+            raise ApiError(400, f"Unknown units in book '{book}': {', '.join(unknown_units)}")
+        if not sum(questions_config.values()):
+            raise ApiError(400, "No questions requested")
+
+        seed = params.get("seed")
+        request = {
+            "book": book,
+            "units": canonical_units(units),
+            "questions_config": canonical_config(questions_config),
+            "seed": new_seed() if seed is None else _int_param(params, "seed", 0, 0),
+            "lang": _choice_param(params, "lang", DEFAULT_LANG, LANGUAGES),
+            "output_format": _choice_param(params, "format", "docx", OUTPUT_FORMATS),
+            "part": _choice_param(params, "part", "full", EXAM_PARTS),
+            "variants": _int_param(params, "variants", 1, 1, MAX_VARIANTS),
+            "sampler": params["sampler"] if from_exam_id else SAMPLER_VERSION,
+            "variant": params["variant"] if from_exam_id else None,
+        }
+        request["exam_id"] = make_exam_id(book, request["units"], request["questions_config"], request["seed"],
+                                          request["sampler"], request["variant"])
+        return request
+
+    async def _generate(self, request: dict) -> bytes:
+        """Runs the generation in the job queue; identical requests already in flight wait for the same job."""
+        key = (request["exam_id"], request["lang"], request["output_format"], request["part"], request["variants"])
+        future = self._inflight.get(key)
+        if future is not None:
+            count("api_requests_coalesced")
+        else:
+            job_id = self.queue.submit(run_exam_job, request["book"], request["units"], request["questions_config"],
+                                       lang=request["lang"], seed=request["seed"], variants=request["variants"],
+                                       books_dir=self.books_dir, output_format=request["output_format"],
+                                       part=request["part"], sampler=request["sampler"],
+                                       variant=request["variant"])
+            future = asyncio.wrap_future(self.queue.future(job_id))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f: self._finish_generation(key, job_id))
+        # shield: um cliente que desconecta não cancela a geração dos outros
+        return await asyncio.shield(future)
+
+    def _finish_generation(self, key: tuple, job_id: str):
+        # O resultado já está no future compartilhado: a fila não precisa guardá-lo
+        self._inflight.pop(key, None)
+        self.queue.discard(job_id)
+
+    async def _send_exam(self, send, request: dict):
+        with stage("api_generate"):
+            document = await self._generate(request)
+        is_zip = request["variants"] > 1 or request["part"] == "split"
+        extension = "zip" if is_zip else request["output_format"]
+        suffix = "-key" if request["part"] == "key" else ""
+        headers = [
+            (b"content-type", (ZIP_MIME if is_zip else OUTPUT_FORMATS[request["output_format"]]).encode()),
+            (b"content-length", str(len(document)).encode()),
+            (b"content-disposition", f'attachment; filename="{request["exam_id"]}{suffix}.{extension}"'.encode()),
+            (b"x-exam-id", request["exam_id"].encode()),
+        ]
+        if request["variants"] > 1:
+            exam_ids = batch_exam_ids(request["book"], request["units"], request["questions_config"], request["seed"],
+                                      request["variants"], request["sampler"])
+            headers.append((b"x-exam-ids", ",".join(exam_ids).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        view = memoryview(document)
+        for start in range(0, len(document), self.chunk_size):
+            end = start + self.chunk_size
+            await send({"type": "http.response.body", "body": bytes(view[start:end]), "more_body": end < len(document)})
+        if not document:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def _send_booklet(self, send, book: str, lang: str):
+        # O .docx é gerado aos poucos numa thread; cada parte é enviada assim que fica pronta.
+        # Um erro antes da primeira parte ainda vira uma resposta de erro (em __call__)
+        chunks = stream_answer_key_booklet(book, lang, self.books_dir)
+        chunk = await self._run_blocking(next, chunks, None)
+        headers = [
+            (b"content-type", OUTPUT_FORMATS["docx"].encode()),
+            (b"content-disposition", f'attachment; filename="{book}-answer-key.docx"'.encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        try:
+            while chunk is not None:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await self._run_blocking(next, chunks, None)
+        except Exception:
+            # A resposta já começou e o status não muda mais: sem a parte final, o servidor
+            # fecha a conexão e o cliente vê a transferência incompleta
+            count("api_errors")
+            logger.exception("Answer-key booklet of book %s failed while streaming", book)
+            return
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _send_document(self, send, handle: str, filename: str):
+        """Streams a document of the exam store from disk, in chunks."""
+        try:
+            document = await self._run_blocking(EXAM_STORE.open, handle)
+        except ValueError:
+            document = None
+        if document is None:
+            raise ApiError(404, "The document expired or does not exist")
+        filename = _SAFE_FILENAME.sub("_", os.path.basename(filename)) or "document"
+        extension = filename.rpartition(".")[2].lower()
+        try:
+            size = os.fstat(document.fileno()).st_size
+            headers = [
+                (b"content-type", DOCUMENT_MIMES.get(extension, "application/octet-stream").encode()),
+                (b"content-length", str(size).encode()),
+                (b"content-disposition", f'attachment; filename="{filename}"'.encode()),
+            ]
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            while True:
+                chunk = await self._run_blocking(document.read, self.chunk_size)
+                await send({"type": "http.response.body", "body": chunk, "more_body": bool(chunk)})
+                if not chunk:
+                    break
+        finally:
+            document.close()
+
+    async def _read_json(self, receive) -> dict:
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_REQUEST_BYTES:
+                raise ApiError(413, "Request body too large")
+            if not message.get("more_body"):
+                break
+        try:
+            params = json.loads(body or b"{}")
+        except ValueError:
+            raise ApiError(400, "The request body must be JSON")
+        if not isinstance(params, dict):
+            raise ApiError(400, "The request body must be a JSON object")
+        return params
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: dict, extra_headers: list = ()):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers + list(extra_headers)})
+        await send({"type": "http.response.body", "body": body})
+
+
+app = ExamApi()
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Serves the exam-generation HTTP API (requires uvicorn).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        print("error: the HTTP API needs an ASGI server: pip install uvicorn", file=sys.stderr)
+        return 2
+    uvicorn.run(ExamApi(args.books_dir), host=args.host, port=args.port, timeout_keep_alive=30)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
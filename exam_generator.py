@@ -0,0 +1,729 @@
+import os
+import heapq
+import io
+import random
+import re
+import zipfile
+from docx_renderer import PAGE_BREAK, answer_key_lines, question_lines, template_identity, with_spacing
+from docx_stream import iter_docx, write_docx
+from fragment_cache import LRUByteCache, answer_key_fragment, question_fragment, serialize_lines
+from bank_format import open_bank
+from question_bank import BOOKS_DIR, load_book_index, load_questions
+from i18n import DEFAULT_LANG, catalogue, translate
+import metrics
+from metrics import count, stage, trace
+from pdf_renderer import PDF_POOL, render_pdf
+from shared_cache import SHARED_CACHE, TieredCache
+from worker_pool import WorkerPool
+
+# --- Exam Generation Core (sem dependência do Streamlit) ---
+
+SECTIONS = ["GRAMMAR", "VOCABULARY"]
+SECTION_CODES = {"grammar": "G", "vocabulary": "V"}
+MAX_DISTINCT_VARIANT_ATTEMPTS = 20
+MAX_FRESH_SEED_ATTEMPTS = 8
+SEED_LIMIT = 36 ** 6
+# Algoritmo de sorteio, marcado no código da prova ("-S2"): 1 = random.sample (códigos
+# sem marca, anteriores ao sorteio balanceado), 2 = sample_balanced. Um código antigo
+# continua reproduzindo a mesma prova.
+SAMPLER_VERSION = 2
+SAMPLERS = (1, 2)
+EXAM_CACHE_MAX_BYTES = int(os.environ.get("CCB_EXAM_CACHE_BYTES", 64 * 1024 * 1024))
+BATCH_WORKERS = int(os.environ.get("CCB_BATCH_WORKERS", os.cpu_count() or 1))
+# Aumente ao mudar o sorteio ou a renderização: as provas do cache compartilhado, que
+# sobrevivem aos deploys, deixam de ser servidas para o mesmo código de prova
+GENERATOR_VERSION = 3
+# full: prova + gabarito; student: só a cópia do aluno; key: só o gabarito (as questões
+# nem são renderizadas); split: cópia do aluno e gabarito em dois arquivos, num .zip
+EXAM_PARTS = ("full", "student", "key", "split")
+OUTPUT_FORMATS = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+# Provas prontas, indexadas por (versão do gerador, template, conteúdo do banco, código da
+# prova, idioma, formato, parte); o backend compartilhado (shared_cache.py) serve as provas
+# já geradas por outras réplicas
+EXAM_CACHE = TieredCache(LRUByteCache(EXAM_CACHE_MAX_BYTES), SHARED_CACHE)
+
+
+def format_units_display(units: list) -> str:
+    """Returns the numeric units of a selection (e.g. '1, 2') for titles and file names."""
+    try:
+        selected_numeric_units = sorted(list(set(re.match(r"(\d+)", u).group(1) for u in units)), key=int)
+        return ", ".join(selected_numeric_units)
+    except:
+        return ", ".join(sorted(units))
+
+
+def expand_units(parsed_units: dict, numeric_units: list) -> list:
+    """
+    Expands numeric units ('1') into their sub-units ('1A', '1B', ...) using the
+    unit listing of the book. Codes that already carry a letter are kept as they are.
+    """
+    final_selected_units = []
+    for num_unit in numeric_units:
+        if num_unit not in parsed_units:
+            final_selected_units.append(num_unit)
+            continue
+        alpha_units = parsed_units.get(num_unit, [])
+        if not alpha_units:
+            final_selected_units.append(num_unit)
+        else:
+            for alpha in alpha_units:
+                final_selected_units.append(f"{num_unit}{alpha}")
+    return final_selected_units
+
+
+def _unit_sort_key(unit_code: str) -> tuple:
+    match = re.match(r"(\d+)(.*)", unit_code)
+    return (int(match.group(1)), match.group(2)) if match else (float('inf'), unit_code)
+
+
+def canonical_units(units: list) -> list:
+    """Sorted, de-duplicated unit codes, so that equivalent selections draw the same exam."""
+    return sorted(set(units), key=_unit_sort_key)
+
+
+def canonical_config(questions_config: dict) -> dict:
+    """Lower-case section names in a fixed order, without the sections set to zero."""
+    return {s.lower(): int(n) for s, n in sorted(questions_config.items(), key=lambda item: item[0].lower()) if n > 0}
+
+
+def new_seed() -> int:
+    return random.SystemRandom().randrange(SEED_LIMIT)
+
+
+def _to_base36(number: int) -> str:
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    encoded = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if number == 0:
+            return encoded
+
+
+def make_exam_id(book: str, units: list, questions_config: dict, seed: int, sampler: int = SAMPLER_VERSION,
+                 variant: int = None) -> str:
+    """
+    Builds a printable exam ID that encodes everything needed to draw the same exam
+    again, e.g. 'ELEMENTARY-1ABC.2AB-G3V3-K2J9Q1-S2' (IDs of sampler 1 have no '-S').
+    Each version of a batch gets its own ID, ending in the version ('-V02').
+    """
+    units_by_number = {}
+    for unit_code in canonical_units(units):
+        match = re.match(r"(\d+)(.*)", unit_code)
+        num_part, alpha_part = match.groups() if match else (unit_code, "")
+        units_by_number.setdefault(num_part, []).append(alpha_part.upper())
+    units_code = ".".join(f"{num}{''.join(alphas)}" for num, alphas in units_by_number.items())
+    config_code = "".join(f"{SECTION_CODES.get(s, s.upper() + '_')}{n}" for s, n in canonical_config(questions_config).items())
+    sampler_code = f"-S{sampler}" if sampler != 1 else ""
+    variant_code = f"-V{variant:02d}" if variant is not None else ""
+    return f"{book}-{units_code}-{config_code}-{_to_base36(seed)}{sampler_code}{variant_code}"
+
+
+_SAMPLER_CODE = re.compile(r"S(\d+)")
+_VARIANT_CODE = re.compile(r"V(\d+)")
+
+
+def _parse_exam_id_core(exam_id: str) -> dict:
+    book, units_code, config_code, seed_code = exam_id.rsplit('-', 3)
+    units = []
+    for unit_group in units_code.split('.'):
+        num_part, alpha_part = re.fullmatch(r"(\d+)([A-Z]*)", unit_group).groups()
+        if alpha_part:
+            units.extend(f"{num_part}{alpha}" for alpha in alpha_part)
+        else:
+            units.append(num_part)
+    if not re.fullmatch(r"(?:[A-Z]+_?\d+)+", config_code) or not re.fullmatch(r"[0-9A-Z]+", seed_code):
+        raise ValueError
+    section_by_code = {code: section for section, code in SECTION_CODES.items()}
+    questions_config = {}
+    for code, count in re.findall(r"([A-Z]+_?)(\d+)", config_code):
+        section = section_by_code.get(code, code.rstrip('_').lower())
+        questions_config[section] = int(count)
+    if not book or not units or not questions_config:
+        raise ValueError
+    return {"book": book, "units": units, "questions_config": questions_config, "seed": int(seed_code, 36)}
+
+
+def parse_exam_id(exam_id: str) -> dict:
+    """
+    Decodes an exam ID built by make_exam_id back into book, units, questions_config,
+    seed, sampler and variant (the version of a batch, or None). IDs without a sampler
+    mark are from sampler 1. Raises ValueError for malformed IDs and for samplers this
+    version does not know.
+    """
+    exam_id = exam_id.strip()
+    head, _sep, last = exam_id.rpartition('-')
+    variant_match = _VARIANT_CODE.fullmatch(last)
+    readings = [(head, int(variant_match.group(1)))] if variant_match else []
+    readings.append((exam_id, None))
+    # Um código antigo pode terminar numa seed como "S2" ou "V02": vale a leitura que fecha
+    candidates = []
+    for reading, variant in readings:
+        reading_head, _sep, reading_last = reading.rpartition('-')
+        sampler_match = _SAMPLER_CODE.fullmatch(reading_last)
+        if sampler_match:
+            candidates.append((reading_head, int(sampler_match.group(1)), variant))
+        candidates.append((reading, 1, variant))
+    for core, sampler, variant in candidates:
+        try:
+            params = _parse_exam_id_core(core)
+        except (ValueError, AttributeError):
+            continue
+        if sampler not in SAMPLERS:
+            raise ValueError(f"Exam ID {exam_id!r} was drawn by an unknown sampler (S{sampler})")
+        if variant is not None and variant < 1:
+            raise ValueError(f"Invalid exam ID: {exam_id!r}")
+        params["sampler"] = sampler
+        params["variant"] = variant
+        return params
+    raise ValueError(f"Invalid exam ID: {exam_id!r}")
+
+
+def exam_id_request(exam_id: str, variants: int = 1) -> dict:
+    """
+    parse_exam_id() plus the number of versions to generate from the ID. The ID of one
+    version of a batch ('-V02') reproduces only that version, so it always asks for one.
+    """
+    params = parse_exam_id(exam_id)
+    params["variants"] = 1 if params["variant"] is not None else variants
+    return params
+
+
+def batch_exam_ids(book: str, units: list, questions_config: dict, seed: int, variants: int = 1,
+                   sampler: int = SAMPLER_VERSION, variant: int = None) -> list:
+    """IDs of the documents of a generation: the exam's own ID, or one '-Vnn' ID per version of a batch."""
+    if variants > 1:
+        return [make_exam_id(book, units, questions_config, seed, sampler, i) for i in range(1, variants + 1)]
+    return [make_exam_id(book, units, questions_config, seed, sampler, variant)]
+
+
+def build_question_pool(book: str, units: list, questions_config: dict, books_dir: str = BOOKS_DIR) -> dict:
+    """
+    Returns {section: [question index entries]} with every question of the requested
+    units and sections, read from the inverted (section, topic) -> unit folder index of
+    the book, so only the questions that can be chosen are touched. The full questions
+    are only decoded (load_questions) after the selection.
+    """
+    numeric_units_map = {}
+    for unit_code in units:
+        match = re.match(r"(\d+)", unit_code)
+        if match:
+            num_part = match.group(1)
+            if num_part not in numeric_units_map:
+                numeric_units_map[num_part] = []
+            numeric_units_map[num_part].append(unit_code)
+
+    book_index = load_book_index(book, books_dir)
+    requested_sections_upper = [s.upper() for s in questions_config.keys() if questions_config[s] > 0]
+
+    topic_refs = book_index["topic_refs"]
+    questions = book_index["questions"]
+
+    pool_by_section = {s: [] for s in SECTIONS}
+    with stage("filter_topics"):
+        for section in requested_sections_upper:
+            if section not in pool_by_section:
+                continue
+            candidate_refs = []
+            for req_unit in units:
+                refs_by_folder = topic_refs.get((section, req_unit), {})
+                unit_refs = [refs for unit_folder, refs in refs_by_folder.items() if unit_folder in numeric_units_map]
+                # Refs crescentes = ordem dos arquivos, a mesma das versões anteriores do índice
+                if len(unit_refs) == 1:
+                    candidate_refs.extend(unit_refs[0])
+                elif unit_refs:
+                    candidate_refs.extend(heapq.merge(*unit_refs))
+            pool_by_section[section] = [questions[ref] for ref in dict.fromkeys(candidate_refs)]
+    count("questions_considered", sum(len(pool) for pool in pool_by_section.values()))
+
+    return pool_by_section
+
+
+def _balanced_cap(num_to_pick: int, values) -> int:
+    """Per-value quota that spreads num_to_pick questions evenly over the values found in the pool."""
+    distinct = len(set(values))
+    return -(-num_to_pick // distinct) if distinct else num_to_pick
+
+
+def sample_balanced(pool: list, num_to_pick: int, units: list = None, rng=random) -> list:
+    """
+    Picks num_to_pick questions in one pass over a shuffled pool, honouring a quota per
+    question type and per topic (an even share of the types/topics available) and never
+    repeating the same instructions. When the pool cannot satisfy the quotas, the
+    remaining places are filled with the skipped questions, in the same random order.
+    """
+    requested_topics = set(units) if units else None
+
+    def topics_of(q):
+        return [t for t in q.get("topic") or () if requested_topics is None or t in requested_topics]
+
+    type_cap = _balanced_cap(num_to_pick, (q.get("type") for q in pool))
+    topic_cap = _balanced_cap(num_to_pick, (t for q in pool for t in topics_of(q)))
+
+    order = list(range(len(pool)))
+    rng.shuffle(order)
+    chosen, skipped = [], []
+    type_counts, topic_counts, seen_instructions = {}, {}, set()
+    for i in order:
+        if len(chosen) == num_to_pick:
+            break
+        q = pool[i]
+        topics = topics_of(q)
+        if (type_counts.get(q.get("type"), 0) < type_cap
+                and all(topic_counts.get(t, 0) < topic_cap for t in topics)
+                and q.get("instructions") not in seen_instructions):
+            chosen.append(q)
+            type_counts[q.get("type")] = type_counts.get(q.get("type"), 0) + 1
+            for t in topics:
+                topic_counts[t] = topic_counts.get(t, 0) + 1
+            seen_instructions.add(q.get("instructions"))
+        else:
+            skipped.append(q)
+
+    # Cotas impossíveis de cumprir: primeiro as instruções ainda não usadas, depois o resto
+    if len(chosen) < num_to_pick:
+        repeated = []
+        for q in skipped:
+            if len(chosen) == num_to_pick:
+                break
+            if q.get("instructions") in seen_instructions:
+                repeated.append(q)
+            else:
+                chosen.append(q)
+                seen_instructions.add(q.get("instructions"))
+        chosen.extend(repeated[:num_to_pick - len(chosen)])
+    if len(chosen) < num_to_pick:
+        count("sampler_quota_relaxed")
+    return chosen
+
+
+def select_questions(pool_by_section: dict, questions_config: dict, rng=random, units: list = None,
+                     sampler: int = SAMPLER_VERSION) -> list:
+    """
+    Picks the requested number of questions per section from the pool, balanced by type
+    and topic; sampler=1 is the plain random.sample draw of the IDs issued before that.
+    """
+    final_question_list = []
+    with stage("sample"):
+        for section, num_requested in questions_config.items():
+            section_upper = section.upper()
+            if num_requested > 0 and section_upper in pool_by_section:
+                pool = pool_by_section[section_upper]
+                num_to_pick = min(num_requested, len(pool))
+                if num_to_pick > 0:
+                    if sampler == 1:
+                        chosen_questions = rng.sample(pool, num_to_pick)
+                    else:
+                        chosen_questions = sample_balanced(pool, num_to_pick, units, rng)
+                    final_question_list.extend(chosen_questions)
+    return final_question_list
+
+
+def variant_selections(pool_by_section: dict, questions_config: dict, seed: int, variants: int, units: list = None,
+                       sampler: int = SAMPLER_VERSION) -> list:
+    """
+    Draws the selections of the first `variants` versions of a batch, avoiding repeating
+    the same combination of questions while possible. Version k only depends on the
+    versions before it, so it can be drawn again on its own; version 1 is the single
+    exam of the seed.
+    """
+    rng = random.Random(seed)
+    selections = []
+    seen_selections = set()
+    for _ in range(variants):
+        for _attempt in range(MAX_DISTINCT_VARIANT_ATTEMPTS):
+            question_list = select_questions(pool_by_section, questions_config, rng, units, sampler)
+            selection_key = frozenset(q["ref"] for q in question_list)
+            if selection_key not in seen_selections:
+                break
+        seen_selections.add(selection_key)
+        selections.append(question_list)
+    return selections
+
+
+def exam_selection(book: str, units: list, questions_config: dict, seed: int, books_dir: str = BOOKS_DIR,
+                   sampler: int = SAMPLER_VERSION, variant: int = None) -> list:
+    """Index entries of the questions drawn for an exam (or one version of a batch) with this seed."""
+    units = canonical_units(units)
+    questions_config = canonical_config(questions_config)
+    pool_by_section = build_question_pool(book, units, questions_config, books_dir)
+    if variant is not None:
+        return variant_selections(pool_by_section, questions_config, seed, variant, units, sampler)[-1]
+    return select_questions(pool_by_section, questions_config, random.Random(seed), units, sampler)
+
+
+def questions_of_exams(exam_ids: list, books_dir: str = BOOKS_DIR) -> set:
+    """Content digests of the questions of previously generated exams (invalid IDs are ignored)."""
+    digests = set()
+    for exam_id in exam_ids:
+        try:
+            params = parse_exam_id(exam_id)
+        except ValueError:
+            continue
+        if os.path.isdir(os.path.join(books_dir, params["book"])):
+            selection = exam_selection(params["book"], params["units"], params["questions_config"], params["seed"],
+                                       books_dir, params["sampler"], params["variant"])
+            digests.update(q["digest"] for q in selection)
+    return digests
+
+
+def choose_seed(book: str, units: list, questions_config: dict, avoid: set = frozenset(),
+                books_dir: str = BOOKS_DIR, attempts: int = MAX_FRESH_SEED_ATTEMPTS) -> int:
+    """
+    Draws a new seed whose exam repeats as few as possible of the `avoid` questions
+    (content digests, e.g. from questions_of_exams() of the teacher's recent exams).
+    The exclusion lives in the seed, so the exam ID still reproduces the same exam.
+    """
+    best_seed, best_overlap = None, None
+    for _attempt in range(attempts if avoid else 1):
+        seed = new_seed()
+        overlap = sum(1 for q in exam_selection(book, units, questions_config, seed, books_dir) if q["digest"] in avoid)
+        if best_overlap is None or overlap < best_overlap:
+            best_seed, best_overlap = seed, overlap
+        if overlap == 0:
+            break
+    count("recent_questions_repeated", best_overlap)
+    return best_seed
+
+
+def exam_layout(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+                exam_id: str = None, part: str = "full") -> tuple:
+    """
+    Describes the structure of an exam, shared by the .docx and .pdf renderers, as
+    two lists of blocks (questions, answer key). A block is ("lines", lines),
+    ("question", question, number) or ("answers", question, number, header).
+    With part="student" the answer key is left out; with part="key" only the
+    heading of the exam and the answer key are laid out.
+    """
+    strings = catalogue(lang)
+    lines = [("title", strings["docx_title"].format(book=book, units=format_units_display(units)))]
+    if part != "key":
+        lines.append(("line", strings["docx_name_date"]))
+    if exam_id is not None:
+        lines.append(("line", strings["docx_exam_id"].format(exam_id=exam_id)))
+    if variant is not None:
+        lines.append(("line", strings["docx_variant"].format(variant=variant)))
+    question_blocks = [("lines", with_spacing(lines))]
+    answer_blocks = []
+
+    final_question_list = sorted(question_list, key=lambda q: q['section'])
+    if not final_question_list:
+        question_blocks.append(("lines", [("line", strings["docx_no_questions_found"])]))
+    else:
+        section_header = strings["docx_section_header"]
+        current_section = None
+
+        for question_counter, q_data in enumerate(final_question_list if part != "key" else [], start=1):
+            if q_data['section'] != current_section:
+                current_section = q_data['section']
+                question_blocks.append(("lines", [("heading", section_header.format(section=current_section.capitalize()))]))
+
+            question_blocks.append(("question", q_data, question_counter))
+
+        # Add the Answer Key (numa página nova só quando vem depois das questões)
+        if part != "student":
+            key_heading = [("heading", strings["docx_answer_key_title"])]
+            answer_blocks.append(("lines", [PAGE_BREAK] + key_heading if part == "full" else key_heading))
+            answer_header = strings["docx_answer_key_question"]
+            for question_counter, q_data in enumerate(final_question_list, start=1):
+                answer_blocks.append(("answers", q_data, question_counter, answer_header))
+
+    return question_blocks, answer_blocks
+
+
+def _block_fragment(block: tuple, lang: str) -> bytes:
+    if block[0] == "question":
+        return question_fragment(block[1], block[2], lang)
+    if block[0] == "answers":
+        return answer_key_fragment(block[1], block[2], block[3], lang)
+    return serialize_lines(block[1])
+
+
+def _block_lines(block: tuple) -> list:
+    if block[0] == "question":
+        return question_lines(block[1], block[2])
+    if block[0] == "answers":
+        return answer_key_lines(block[1], block[2], block[3])
+    return block[1]
+
+
+def exam_fragments(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+                   exam_id: str = None, part: str = "full") -> list:
+    """
+    Returns the body of an exam (the selected questions and/or the answer key, see
+    exam_layout) as a list of XML fragments, splicing the cached question fragments.
+    """
+    question_blocks, answer_blocks = exam_layout(book, units, question_list, lang, variant, exam_id, part)
+    with stage("render_questions"):
+        fragments = [_block_fragment(block, lang) for block in question_blocks]
+    with stage("render_answer_key"):
+        fragments += [_block_fragment(block, lang) for block in answer_blocks]
+    if metrics.enabled():
+        count("paragraphs_written", sum(fragment.count(b"<w:p>") for fragment in fragments))
+    return fragments
+
+
+def exam_lines(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+               exam_id: str = None, part: str = "full") -> list:
+    """Returns the whole exam as (style, text) lines, for the PDF renderer."""
+    question_blocks, answer_blocks = exam_layout(book, units, question_list, lang, variant, exam_id, part)
+    return [line for block in question_blocks + answer_blocks for line in _block_lines(block)]
+
+
+def render_exam_docx(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+                     exam_id: str = None, part: str = "full") -> io.BytesIO:
+    """
+    Writes the selected questions and the answer key into a .docx document built
+    from the precompiled base template by the streaming writer (docx_stream.py).
+    """
+    fragments = exam_fragments(book, units, question_list, lang, variant, exam_id, part)
+
+    # Save the document to a byte stream in memory
+    with stage("save_docx"):
+        doc_io = io.BytesIO()
+        write_docx(doc_io, fragments)
+    doc_io.seek(0)
+    return doc_io
+
+
+def render_exam_pdf(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+                    exam_id: str = None, use_pool: bool = True, part: str = "full") -> io.BytesIO:
+    """
+    Renders the same exam as a PDF. By default the conversion runs in the shared
+    PDF worker pool; use_pool=False renders in the calling process.
+    """
+    lines = exam_lines(book, units, question_list, lang, variant, exam_id, part)
+    title = translate("docx_title", lang).format(book=book, units=format_units_display(units))
+    with stage("render_pdf"):
+        pdf_bytes = PDF_POOL.run(render_pdf, lines, title) if use_pool else render_pdf(lines, title)
+    return io.BytesIO(pdf_bytes)
+
+
+def render_exam(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, variant: int = None,
+                exam_id: str = None, output_format: str = "docx", use_pool: bool = True,
+                part: str = "full") -> io.BytesIO:
+    """Renders one document (part "full", "student" or "key") of an exam in one of OUTPUT_FORMATS."""
+    if output_format == "pdf":
+        return render_exam_pdf(book, units, question_list, lang, variant, exam_id, use_pool, part)
+    if output_format != "docx":
+        raise ValueError(f"Unknown output format: {output_format!r}")
+    return render_exam_docx(book, units, question_list, lang, variant, exam_id, part)
+
+
+def document_parts(part: str) -> tuple:
+    """The documents rendered for one of EXAM_PARTS ("split" is a student copy and a separate key)."""
+    if part not in EXAM_PARTS:
+        raise ValueError(f"Unknown exam part: {part!r}")
+    return ("student", "key") if part == "split" else (part,)
+
+
+def document_filename(part: str, book: str, units: list, lang: str, output_format: str, variant: int = None) -> str:
+    """File name of one document of an exam (answer keys get their own name)."""
+    units_filename = format_units_display(units).replace(", ", "_")
+    if variant is None:
+        key = "filename_answer_key" if part == "key" else "filename_test"
+        return translate(key, lang).format(book=book, units=units_filename, ext=output_format)
+    key = "filename_variant_key" if part == "key" else "filename_variant"
+    return translate(key, lang).format(book=book, units=units_filename, variant=f"{variant:02d}", ext=output_format)
+
+
+def booklet_fragments(book: str, lang: str = DEFAULT_LANG, books_dir: str = BOOKS_DIR):
+    """
+    Yields the XML of an answer-key booklet with every question of the book, unit by
+    unit, each followed by its answers. Questions are decoded from the bank one at a
+    time and are not kept in the fragment cache, so memory does not grow with the book.
+    """
+    strings = catalogue(lang)
+    book_index = load_book_index(book, books_dir)
+    yield serialize_lines(with_spacing([("title", strings["docx_booklet_title"].format(book=book))]))
+    if not book_index["questions"]:
+        yield serialize_lines([("line", strings["docx_no_questions_found"])])
+        return
+
+    bank = open_bank(book_index["bank_path"])
+    unit_header = strings["docx_booklet_unit"]
+    section_header = strings["docx_section_header"]
+    answer_header = strings["docx_booklet_answers"]
+    files = book_index["files"]
+    current_unit = current_section = None
+    question_counter = 0
+    for relative_path in sorted(files, key=lambda path: (_unit_sort_key(files[path]["unit"]), files[path]["section"] or "", path)):
+        entry = files[relative_path]
+        for meta in entry["questions"]:
+            if entry["unit"] != current_unit:
+                current_unit, current_section = entry["unit"], None
+                yield serialize_lines([("heading", unit_header.format(unit=current_unit))])
+            if entry["section"] != current_section:
+                current_section = entry["section"]
+                yield serialize_lines([("heading", section_header.format(section=(current_section or "").capitalize()))])
+            question_counter += 1
+            q_data = bank.question(meta["ref"])
+            yield serialize_lines(question_lines(q_data, question_counter) +
+                                  answer_key_lines(q_data, question_counter, answer_header))
+    count("booklet_questions_written", question_counter)
+
+
+def write_answer_key_booklet(output, book: str, lang: str = DEFAULT_LANG, books_dir: str = BOOKS_DIR):
+    """Streams the answer-key booklet of a whole book into `output` (a file object)."""
+    with stage("write_booklet"):
+        write_docx(output, booklet_fragments(book, lang, books_dir))
+
+
+def stream_answer_key_booklet(book: str, lang: str = DEFAULT_LANG, books_dir: str = BOOKS_DIR):
+    """Yields the .docx bytes of the answer-key booklet in chunks (e.g. for a chunked HTTP response)."""
+    return iter_docx(booklet_fragments(book, lang, books_dir))
+
+
+def generate_exam(book: str, units: list, questions_config: dict, lang: str = DEFAULT_LANG,
+                  seed: int = None, books_dir: str = BOOKS_DIR, output_format: str = "docx",
+                  part: str = "full", sampler: int = SAMPLER_VERSION, variant: int = None) -> tuple:
+    """
+    Generates a .docx (or .pdf) document and returns (exam_id, BytesIO). The selection
+    is fully determined by the seed (a new one is drawn when it is not given) and finished
+    documents are served from EXAM_CACHE while the question bank does not change.
+    `part` is one of EXAM_PARTS; with "split" the student copy and the answer key of the
+    same selection are returned as two documents in a .zip. `sampler` and `variant` are
+    those of the exam ID being reproduced (parse_exam_id): with a variant, the document
+    is that version of the batch drawn with the seed. New exams use SAMPLER_VERSION.
+    """
+    if seed is None:
+        seed = new_seed()
+    units = canonical_units(units)
+    questions_config = canonical_config(questions_config)
+    exam_id = make_exam_id(book, units, questions_config, seed, sampler, variant)
+
+    if not os.path.exists(os.path.join(books_dir, book)):
+        return exam_id, io.BytesIO()
+
+    with trace("exam_generated", exam_id=exam_id, lang=lang, format=output_format, part=part):
+        book_index = load_book_index(book, books_dir)
+        cache_key = ("exam", GENERATOR_VERSION, template_identity(), book_index["digest"], exam_id, lang,
+                     output_format, part)
+        cached_docx = EXAM_CACHE.get(cache_key)
+        if cached_docx is not None:
+            count("exam_cache_hits")
+            return exam_id, io.BytesIO(cached_docx)
+
+        selected = exam_selection(book, units, questions_config, seed, books_dir, sampler, variant)
+        final_question_list = load_questions(book_index, selected)
+        doc_io = render_exam_documents(book, units, final_question_list, lang, exam_id, output_format, part,
+                                       variant)
+        EXAM_CACHE.put(cache_key, doc_io.getvalue())
+        count("exams_generated")
+        count("bytes_written", doc_io.getbuffer().nbytes)
+        return exam_id, doc_io
+
+
+def render_exam_documents(book: str, units: list, question_list: list, lang: str = DEFAULT_LANG, exam_id: str = None,
+                          output_format: str = "docx", part: str = "full", variant: int = None) -> io.BytesIO:
+    """Renders the document of an exam, or the .zip with its student copy and key for part="split"."""
+    documents = [(document_filename(doc_part, book, units, lang, output_format),
+                  render_exam(book, units, question_list, lang, variant=variant, exam_id=exam_id,
+                              output_format=output_format, part=doc_part).getvalue())
+                 for doc_part in document_parts(part)]
+    return io.BytesIO(documents[0][1]) if len(documents) == 1 else zip_documents(documents)
+
+
+def picked_exam_units(book: str, digests: list, books_dir: str = BOOKS_DIR) -> list:
+    """Unit folders of hand-picked questions, for titles and file names."""
+    wanted = set(digests)
+    return canonical_units({meta["unit"] for meta in load_book_index(book, books_dir)["questions"]
+                            if meta["digest"] in wanted})
+
+
+def generate_picked_exam(book: str, digests: list, lang: str = DEFAULT_LANG, books_dir: str = BOOKS_DIR,
+                         output_format: str = "docx", part: str = "full") -> io.BytesIO:
+    """
+    Renders an exam from hand-picked questions (content digests, e.g. from search hits
+    in search_index.py), in the given order within each section. A hand-picked exam has
+    no exam ID: it is not drawn from a seed. Digests no longer in the bank are skipped.
+    """
+    with trace("exam_generated", exam_id=None, lang=lang, format=output_format, part=part, picked=len(digests)):
+        book_index = load_book_index(book, books_dir)
+        by_digest = {meta["digest"]: meta for meta in book_index["questions"]}
+        selected = [by_digest[digest] for digest in dict.fromkeys(digests) if digest in by_digest]
+        units = canonical_units({meta["unit"] for meta in selected})
+        final_question_list = load_questions(book_index, selected)
+        doc_io = render_exam_documents(book, units, final_question_list, lang, None, output_format, part)
+        count("exams_generated")
+        count("bytes_written", doc_io.getbuffer().nbytes)
+        return doc_io
+
+
+def zip_documents(documents: list) -> io.BytesIO:
+    """Packs (file name, bytes) documents into a .zip."""
+    zip_io = io.BytesIO()
+    with stage("write_zip"), zipfile.ZipFile(zip_io, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for filename, document_bytes in documents:
+            zip_file.writestr(filename, document_bytes)
+    zip_io.seek(0)
+    return zip_io
+
+
+def generate_exam_docx(book: str, units: list, questions_config: dict, lang: str = DEFAULT_LANG,
+                       seed: int = None, books_dir: str = BOOKS_DIR) -> io.BytesIO:
+    """
+    Generates a .docx document. With a `seed` the question selection is reproducible.
+    """
+    return generate_exam(book, units, questions_config, lang, seed, books_dir)[1]
+
+
+def _render_variant(args: tuple) -> list:
+    """
+    Process pool worker: decodes the selected questions from the memory-mapped bank
+    and renders the documents of one exam variant, returning [(file name, bytes)].
+    """
+    book, units, bank_path, refs, lang, variant, exam_id, output_format, part = args
+    bank = open_bank(bank_path)
+    question_list = [bank.question(ref) for ref in refs]
+    # Já roda num processo do lote: o PDF é renderizado aqui mesmo, sem passar pelo PDF_POOL
+    return [(document_filename(doc_part, book, units, lang, output_format, variant),
+             render_exam(book, units, question_list, lang, variant=variant, exam_id=exam_id,
+                         output_format=output_format, use_pool=False, part=doc_part).getvalue())
+            for doc_part in document_parts(part)]
+
+
+# --- Pooled Batch Workers ---
+
+# Lotes de provas disputam os mesmos BATCH_WORKERS processos (worker_pool.py)
+BATCH_POOL = WorkerPool(BATCH_WORKERS)
+
+
+def generate_exam_batch(book: str, units: list, questions_config: dict, variants: int, lang: str = DEFAULT_LANG,
+                        seed: int = None, books_dir: str = BOOKS_DIR, in_process: bool = False,
+                        progress=None, output_format: str = "docx", part: str = "full",
+                        sampler: int = SAMPLER_VERSION) -> io.BytesIO:
+    """
+    Generates `variants` different versions of the same exam and returns them in a .zip.
+    The question pool is built once and the documents are rendered in BATCH_POOL
+    (in_process=True renders them in this process instead).
+    Every version prints its own exam ID ('-V02'), which reproduces that version alone.
+    With part="split" each version contributes its student copy and its answer key.
+    `progress(done, total)` is called as the versions are rendered.
+    """
+    if seed is None:
+        seed = new_seed()
+    units = canonical_units(units)
+    questions_config = canonical_config(questions_config)
+    pool_by_section = build_question_pool(book, units, questions_config, books_dir)
+    selections = variant_selections(pool_by_section, questions_config, seed, variants, units, sampler)
+
+    bank_path = load_book_index(book, books_dir)["bank_path"]
+    jobs = [(book, units, bank_path, [q["ref"] for q in question_list], lang, i + 1,
+             make_exam_id(book, units, questions_config, seed, sampler, i + 1), output_format, part)
+            for i, question_list in enumerate(selections)]
+    rendered = []
+    with stage("render_variants"):
+        for documents in (map(_render_variant, jobs) if in_process else BATCH_POOL.map(_render_variant, jobs)):
+            rendered.append(documents)
+            if progress is not None:
+                progress(len(rendered), len(jobs))
+    count("exams_generated", len(rendered))
+
+    zip_io = zip_documents([document for documents in rendered for document in documents])
+    count("bytes_written", zip_io.getbuffer().nbytes)
+    return zip_io
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from exam_generator import SAMPLER_VERSION, generate_exam, generate_exam_batch, generate_picked_exam
+from i18n import DEFAULT_LANG
+from question_bank import BOOKS_DIR
+
+# --- Background Exam Generation Jobs ---
+#
+# A interface envia a geração para uma fila limitada e acompanha o andamento pelo
+# ID do job, sem bloquear o script do Streamlit. Os resultados ficam guardados por
+# JOB_RESULT_TTL segundos depois de prontos, ou até serem retirados com discard().
+
+JOB_WORKERS = int(os.environ.get("CCB_JOB_WORKERS", os.cpu_count() or 1))
+JOB_MAX_PENDING = int(os.environ.get("CCB_JOB_MAX_PENDING", 32))
+JOB_RESULT_TTL = float(os.environ.get("CCB_JOB_RESULT_TTL", 600))
+JOB_EXECUTOR = os.environ.get("CCB_JOB_EXECUTOR", "thread")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue already holds its maximum number of jobs."""
+
+
+class JobQueue:
+    """
+    Bounded pool of generation jobs. Jobs run in threads by default, or in processes
+    with use_processes=True (progress is then only reported when the job finishes).
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 result_ttl: float = JOB_RESULT_TTL, use_processes: bool = JOB_EXECUTOR == "process"):
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.use_processes = use_processes
+        self.result_ttl = result_ttl
+        self._executor = executor_class(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> str:
+        """
+        Queues fn(*args, **kwargs) and returns the job ID. Raises QueueFullError when
+        there is no free slot. In thread mode, fn receives a `progress(done, total)` callback.
+        """
+        self.purge_expired()
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("The exam generation queue is full.")
+
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "submitted_at": time.time(), "finished_at": None, "progress": None}
+        if not self.use_processes:
+            kwargs["progress"] = lambda done, total: job.update(progress=done / total if total else None)
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        job["future"] = future
+        with self._lock:
+            self._jobs[job_id] = job
+        future.add_done_callback(lambda _f: self._finish(job))
+        return job_id
+
+    def _finish(self, job: dict):
+        job["finished_at"] = time.time()
+        job["progress"] = 1.0
+        self._slots.release()
+
+    def _state(self, job: dict) -> str:
+        future = job["future"]
+        if future.done():
+            return FAILED if future.exception() is not None else DONE
+        return RUNNING if future.running() else QUEUED
+
+    def status(self, job_id: str) -> dict:
+        """Returns the job state, progress and error message, or None for unknown/expired jobs."""
+        self.purge_expired()
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        state = self._state(job)
+        status = {
+            "id": job_id,
+            "state": state,
+            "progress": job["progress"],
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+            "error": str(job["future"].exception()) if state == FAILED else None,
+        }
+        if state == QUEUED:
+            with self._lock:
+                status["position"] = sum(
+                    1 for other in self._jobs.values()
+                    if other["submitted_at"] < job["submitted_at"] and self._state(other) == QUEUED
+                )
+        return status
+
+    def result(self, job_id: str):
+        """Returns the result of a finished job (None while it is running); re-raises its error."""
+        job = self._jobs.get(job_id)
+        if job is None or not job["future"].done():
+            return None
+        return job["future"].result()
+
+    def wait(self, job_id: str, timeout: float = None):
+        return self._jobs[job_id]["future"].result(timeout=timeout)
+
+    def future(self, job_id: str):
+        """The concurrent.futures.Future of a job (e.g. for asyncio.wrap_future in the HTTP API)."""
+        return self._jobs[job_id]["future"]
+
+    def discard(self, job_id: str):
+        """Forgets a finished job and its result (e.g. once the result has been moved to the exam store)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job["future"].done():
+                del self._jobs[job_id]
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and now - job["finished_at"] > self.result_ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def run_exam_job(book: str, units: list, questions_config: dict, lang: str = DEFAULT_LANG, seed: int = None,
+                 variants: int = 1, books_dir: str = BOOKS_DIR, output_format: str = "docx", progress=None,
+                 part: str = "full", sampler: int = SAMPLER_VERSION, variant: int = None) -> bytes:
+    """Job body: generates one exam (or a ZIP of versions, or one version of a batch) and returns its bytes."""
+    if variants > 1:
+        return generate_exam_batch(book, units, questions_config, variants, lang=lang, seed=seed,
+                                   books_dir=books_dir, progress=progress, output_format=output_format,
+                                   part=part, sampler=sampler).getvalue()
+    exam_io = generate_exam(book, units, questions_config, lang=lang, seed=seed, books_dir=books_dir,
+                            output_format=output_format, part=part, sampler=sampler, variant=variant)[1]
+    if progress is not None:
+        progress(1, 1)
+    return exam_io.getvalue()
+
+
+def submit_exam(queue: JobQueue, book: str, units: list, questions_config: dict, lang: str = DEFAULT_LANG,
+                seed: int = None, variants: int = 1, books_dir: str = BOOKS_DIR, output_format: str = "docx",
+                part: str = "full", sampler: int = SAMPLER_VERSION, variant: int = None) -> str:
+    return queue.submit(run_exam_job, book, units, questions_config, lang=lang, seed=seed, variants=variants,
+                        books_dir=books_dir, output_format=output_format, part=part, sampler=sampler,
+                        variant=variant)
+
+
+def run_picked_exam_job(book: str, digests: list, lang: str = DEFAULT_LANG, books_dir: str = BOOKS_DIR,
+                        output_format: str = "docx", part: str = "full", progress=None) -> bytes:
+    """Job body: renders an exam from hand-picked questions and returns its bytes."""
+    exam_io = generate_picked_exam(book, digests, lang=lang, books_dir=books_dir, output_format=output_format, part=part)
+    if progress is not None:
+        progress(1, 1)
+    return exam_io.getvalue()
+
+
+def submit_picked_exam(queue: JobQueue, book: str, digests: list, lang: str = DEFAULT_LANG,
+                       books_dir: str = BOOKS_DIR, output_format: str = "docx", part: str = "full") -> str:
+    return queue.submit(run_picked_exam_job, book, list(digests), lang=lang, books_dir=books_dir,
+                        output_format=output_format, part=part)
@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+import time
+import uuid
+from urllib.parse import quote
+from metrics import count
+from shared_cache import scan_directory, trim_directory
+
+# --- Finished-Exam Store ---
+#
+# Os documentos prontos ficam em arquivos, não na sessão do Streamlit: a sessão guarda
+# só um handle (st.session_state.exam_handle); os arquivos expiram sozinhos.
+#
+# O st.download_button copia o arquivo inteiro para a memória do Streamlit enquanto o
+# botão aparece. Com CCB_EXAM_DOWNLOAD_URL, a página mostra em vez dele um link para a
+# rota /documents/<handle> da API HTTP (exam_api.py, com o mesmo CCB_EXAM_STORE_DIR),
+# que envia o arquivo do disco em partes: nenhuma sessão segura os bytes.
+#
+#   CCB_EXAM_STORE_DIR=.cache/exams          diretório dos documentos
+#   CCB_EXAM_STORE_BYTES=536870912           limite total; os menos usados são removidos antes
+#   CCB_EXAM_STORE_TTL=3600                  segundos sem acesso até um documento expirar
+#   CCB_EXAM_DOWNLOAD_URL=https://host/api   endereço público da API (sem ele, download_button)
+
+EXAM_STORE_DIR = os.environ.get("CCB_EXAM_STORE_DIR",
+                                os.path.join(os.environ.get("CCB_CACHE_DIR", ".cache"), "exams"))
+EXAM_STORE_MAX_BYTES = int(os.environ.get("CCB_EXAM_STORE_BYTES", 512 * 1024 * 1024))
+EXAM_STORE_TTL = float(os.environ.get("CCB_EXAM_STORE_TTL", 3600))
+EXAM_DOWNLOAD_URL = os.environ.get("CCB_EXAM_DOWNLOAD_URL")
+SWEEP_INTERVAL = 60  # segundos entre varreduras de expiração
+
+_HANDLE = re.compile(r"[0-9a-f]{32}")
+
+
+class ExamStore:
+    """
+    Size-capped directory of finished documents with TTL eviction. put() returns an
+    opaque handle; open() returns a read-only file for it, or None once it has expired.
+    Reads refresh the access time, so an exam being downloaded is the last to go.
+    """
+
+    def __init__(self, directory: str = EXAM_STORE_DIR, max_bytes: int = EXAM_STORE_MAX_BYTES,
+                 ttl: float = EXAM_STORE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._estimated_bytes = None
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, handle: str) -> str:
+        if not isinstance(handle, str) or not _HANDLE.fullmatch(handle):
+            raise ValueError(f"Invalid exam handle: {handle!r}")
+        return os.path.join(self.directory, f"{handle}.bin")
+
+    def put(self, data: bytes) -> str:
+        """Writes a document and returns its handle."""
+        handle = uuid.uuid4().hex
+        path = self._path(handle)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        count("exam_store_writes")
+        with self._lock:
+            if self._estimated_bytes is None:
+                self._estimated_bytes = scan_directory(self.directory)[1]
+            else:
+                self._estimated_bytes += len(data)
+            if self._estimated_bytes > self.max_bytes or time.time() - self._last_sweep > SWEEP_INTERVAL:
+                self._evict()
+        return handle
+
+    def open(self, handle: str):
+        """Opens a stored document for reading (binary file), or returns None if it expired or was evicted."""
+        path = self._path(handle)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                self.discard(handle)
+                count("exam_store_expired")
+                return None
+            f = open(path, 'rb')
+            os.utime(path)
+        except OSError:
+            count("exam_store_misses")
+            return None
+        return f
+
+    def discard(self, handle: str):
+        try:
+            size = os.stat(self._path(handle)).st_size
+            os.remove(self._path(handle))
+        except OSError:
+            return
+        with self._lock:
+            if self._estimated_bytes is not None:
+                self._estimated_bytes -= size
+
+    def _evict(self):
+        # Primeiro os expirados, depois os menos usados até ficar abaixo do limite
+        self._estimated_bytes, removed = trim_directory(self.directory, self.max_bytes, self.ttl)
+        self._last_sweep = time.time()
+        count("exam_store_evictions", removed)
+
+    def sweep(self):
+        """Removes expired documents (and the oldest ones over the size limit)."""
+        with self._lock:
+            self._evict()
+
+
+def download_url(handle: str, filename: str, base_url: str = EXAM_DOWNLOAD_URL) -> str:
+    """Link to a stored document on the HTTP API (GET /documents/<handle>?filename=...), or None without base_url."""
+    if not base_url:
+        return None
+    return f"{base_url.rstrip('/')}/documents/{handle}?filename={quote(filename)}"
+
+
+EXAM_STORE = ExamStore()
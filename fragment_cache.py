@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import OrderedDict
+from docx_renderer import (answer_body_lines, answer_header_line, lines_xml,
+                           question_body_lines, question_header_line)
+
+# --- Rendered Question Fragment Cache ---
+#
+# O corpo de cada questão (tudo abaixo da linha numerada) e as respostas do gabarito
+# são renderizados uma vez em XML e guardados num cache LRU, indexado pelo hash do
+# conteúdo da questão e pelo idioma. A montagem da prova só cria as linhas numeradas
+# e reaproveita os fragmentos.
+
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("CCB_FRAGMENT_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+class LRUByteCache:
+    """Thread-safe LRU cache of byte strings, bounded by their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+FRAGMENT_CACHE = LRUByteCache(FRAGMENT_CACHE_MAX_BYTES)
+
+
+def serialize_lines(lines: list) -> bytes:
+    """Renders (style, text) lines into the inner XML of a <w:body> fragment."""
+    return lines_xml(lines)
+
+
+def _cached_fragment(kind: str, question_data: dict, lang: str, build_lines, cache: LRUByteCache) -> bytes:
+    digest = question_data.get("digest")
+    if digest is None or cache is None:
+        return serialize_lines(build_lines(question_data))
+    key = (kind, digest, lang)
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = serialize_lines(build_lines(question_data))
+        cache.put(key, fragment)
+    return fragment
+
+
+def question_fragment(question_data: dict, question_number: int, lang: str, cache: LRUByteCache = FRAGMENT_CACHE) -> bytes:
+    """Returns the XML of a numbered question, reusing its cached body."""
+    fragment = _cached_fragment("question", question_data, lang, question_body_lines, cache)
+    return serialize_lines([question_header_line(question_data, question_number)]) + fragment
+
+
+def answer_key_fragment(question_data: dict, question_number: int, header: str, lang: str,
+                        cache: LRUByteCache = FRAGMENT_CACHE) -> bytes:
+    """Returns the XML of a question's answer key entry, reusing its cached answers."""
+    fragment = _cached_fragment("answers", question_data, lang, answer_body_lines, cache)
+    return serialize_lines([answer_header_line(header, question_number, bool(fragment))]) + fragment
@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+
+# --- I18N (Internationalization) Setup ---
+#
+# As traduções ficam em locales/<idioma>.json e a lista de idiomas (código -> nome
+# exibido) em locales/languages.json. Cada catálogo só é lido na primeira vez que o
+# idioma é usado, já combinado com o en_GB para as chaves que faltam, e fica em
+# memória: memória e tempo de início não crescem com o número de idiomas.
+#
+# Para adicionar um idioma, crie locales/<código>.json e registre-o em languages.json.
+
+LOCALES_DIR = os.environ.get("CCB_LOCALES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales"))
+DEFAULT_LANG = "pt_BR"
+FALLBACK_LANG = "en_GB"
+
+_catalogues = {}
+_catalogues_lock = threading.RLock()
+
+
+def _read_json(filename: str) -> dict:
+    with open(os.path.join(LOCALES_DIR, filename), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Código -> nome exibido, na ordem do arquivo
+LANGUAGE_NAMES = _read_json("languages.json")
+LANGUAGES = tuple(LANGUAGE_NAMES)
+LANG_OPTIONS_DISPLAY = {name: code for code, name in LANGUAGE_NAMES.items()}
+
+
+class _Catalogue(dict):
+    def __missing__(self, key):
+        return f"Missing_Key: {key}"
+
+
+def catalogue(lang_code: str = DEFAULT_LANG) -> dict:
+    """
+    Returns every string of a language (missing keys fall back to en_GB, unknown
+    languages to en_GB). Bind it once and index it, e.g. strings["docx_title"].
+    """
+    strings = _catalogues.get(lang_code)
+    if strings is not None:
+        return strings
+    if lang_code not in LANGUAGE_NAMES:
+        return catalogue(FALLBACK_LANG)
+    with _catalogues_lock:
+        strings = _catalogues.get(lang_code)
+        if strings is None:
+            strings = _Catalogue(catalogue(FALLBACK_LANG)) if lang_code != FALLBACK_LANG else _Catalogue()
+            strings.update(_read_json(f"{lang_code}.json"))
+            _catalogues[lang_code] = strings
+    return strings
+
+
+def translate(key: str, lang_code: str = DEFAULT_LANG) -> str:
+    """Busca uma string de tradução para o idioma informado."""
+    return catalogue(lang_code)[key]
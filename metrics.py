@@ -0,0 +1,210 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Pipeline Timing and Counters ---
+#
+# Cronômetros por etapa (listagem, leitura do JSON, filtro por tópico, sorteio,
+# renderização, gabarito, gravação do .docx) e contadores (arquivos lidos, bytes,
+# questões consideradas, parágrafos escritos). Desligado por padrão: com
+# CCB_METRICS desativado, stage() devolve um contexto vazio e count() retorna na hora.
+#
+#   CCB_METRICS=1              liga a coleta e o log estruturado de cada prova
+#   CCB_METRICS_FILE=path      grava o dump no formato Prometheus ao sair do processo
+#   CCB_METRICS_PORT=9100      expõe GET /metrics (ver start_metrics_server)
+#
+# Etapas executadas nos processos do lote (generate_exam_batch) não são somadas aqui.
+
+METRICS_ENABLED = os.environ.get("CCB_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_FILE = os.environ.get("CCB_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("CCB_METRICS_PORT", 0))
+METRICS_PREFIX = "ccb"
+
+logger = logging.getLogger(__name__)
+
+_NULL_STAGE = nullcontext()
+_stage_totals = {}  # stage -> [calls, total seconds, max seconds]
+_counters = {}
+_metrics_lock = threading.Lock()
+_local = threading.local()
+
+
+def _configure_logger():
+    # O log estruturado vai para o stderr mesmo sob Streamlit ou uvicorn, que não configuram o logger raiz
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def enabled() -> bool:
+    """Whether metrics are being collected: guards measurements that cost something to compute."""
+    return METRICS_ENABLED
+
+
+def set_enabled(enabled: bool):
+    """Turns the collection on or off at runtime (e.g. from the CLI)."""
+    global METRICS_ENABLED
+    METRICS_ENABLED = enabled
+    if enabled:
+        _configure_logger()
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        with _metrics_lock:
+            totals = _stage_totals.setdefault(self.name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] = max(totals[2], elapsed)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace["stages"][self.name] = trace["stages"].get(self.name, 0.0) + elapsed
+        return False
+
+
+def stage(name: str):
+    """Context manager that times one pipeline stage (a no-op when metrics are off)."""
+    if not METRICS_ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def count(name: str, value: int = 1):
+    """Adds `value` to a counter (a no-op when metrics are off)."""
+    if not METRICS_ENABLED:
+        return
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + value
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace["counters"][name] = trace["counters"].get(name, 0) + value
+
+
+class _Trace:
+    """Collects the stages and counters of one request and logs them as a single JSON line."""
+
+    def __init__(self, event: str, fields: dict):
+        self.event = event
+        self.fields = fields
+
+    def __enter__(self):
+        self.previous = getattr(_local, "trace", None)
+        self.started = time.perf_counter()
+        _local.trace = {"stages": {}, "counters": {}}
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = _local.trace
+        _local.trace = self.previous
+        record = {"event": self.event, **self.fields,
+                  "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                  "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in trace["stages"].items()},
+                  "counters": trace["counters"]}
+        if exc_type is not None:
+            record["error"] = repr(exc)
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return False
+
+
+def trace(event: str, **fields):
+    """Groups the stages of one generation into a structured log line (a no-op when metrics are off)."""
+    if not METRICS_ENABLED:
+        return _NULL_STAGE
+    return _Trace(event, fields)
+
+
+def snapshot() -> dict:
+    with _metrics_lock:
+        return {"stages": {name: list(totals) for name, totals in _stage_totals.items()},
+                "counters": dict(_counters)}
+
+
+def reset():
+    with _metrics_lock:
+        _stage_totals.clear()
+        _counters.clear()
+
+
+def render_prometheus() -> str:
+    """Returns the collected metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = [
+        f"# HELP {METRICS_PREFIX}_stage_seconds_total Time spent in each generation stage.",
+        f"# TYPE {METRICS_PREFIX}_stage_seconds_total counter",
+    ]
+    lines += [f'{METRICS_PREFIX}_stage_seconds_total{{stage="{name}"}} {totals[1]:.6f}'
+              for name, totals in sorted(data["stages"].items())]
+    lines += [
+        f"# HELP {METRICS_PREFIX}_stage_calls_total Number of times each generation stage ran.",
+        f"# TYPE {METRICS_PREFIX}_stage_calls_total counter",
+    ]
+    lines += [f'{METRICS_PREFIX}_stage_calls_total{{stage="{name}"}} {totals[0]}'
+              for name, totals in sorted(data["stages"].items())]
+    lines += [
+        f"# HELP {METRICS_PREFIX}_stage_max_seconds Slowest run of each generation stage.",
+        f"# TYPE {METRICS_PREFIX}_stage_max_seconds gauge",
+    ]
+    lines += [f'{METRICS_PREFIX}_stage_max_seconds{{stage="{name}"}} {totals[2]:.6f}'
+              for name, totals in sorted(data["stages"].items())]
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+        lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def dump(path: str):
+    """Writes the Prometheus text dump to `path`."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves GET /metrics from a daemon thread and returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def _dump_at_exit():
+    if METRICS_ENABLED:
+        dump(METRICS_FILE)
+
+
+if METRICS_ENABLED:
+    _configure_logger()
+if METRICS_FILE:
+    atexit.register(_dump_at_exit)
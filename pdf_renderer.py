@@ -0,0 +1,212 @@
+import os
+import unicodedata
+import zlib
+from docx_renderer import PAGE_BREAK
+from worker_pool import WorkerPool
+
+# --- PDF Rendering Engine ---
+#
+# Renderizador PDF em Python puro: recebe as mesmas linhas (estilo, texto) usadas no
+# .docx e monta as páginas com as fontes padrão Helvetica/Helvetica-Bold (sem
+# embutir fontes), no mesmo tamanho de página e margens do template do Word. Os
+# símbolos do banco que não existem em WinAnsi (✓ e o ✓ do Wingdings colado do Word)
+# saem na ZapfDingbats, que também é uma fonte padrão dos leitores de PDF.
+#
+# As conversões rodam num pool de processos de longa duração (PDF_POOL), com fila
+# limitada: quem chama espera uma vaga em vez de abrir um conversor por arquivo.
+
+PDF_WORKERS = int(os.environ.get("CCB_PDF_WORKERS", 2))
+PDF_MAX_PENDING = int(os.environ.get("CCB_PDF_MAX_PENDING", 16))
+
+# Carta (12240 x 15840 twips) com as margens do template: 1" em cima/embaixo, 1,25" dos lados
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN_X, MARGIN_Y = 90, 72
+LINE_HEIGHT = 1.25
+
+# key: (font, size, space before, space after)
+PDF_STYLES = {
+    "title": ("F2", 20, 0, 12),
+    "heading": ("F2", 14, 12, 6),
+    "line": ("F1", 11, 0, 0),
+    "line_spaced": ("F1", 11, 0, 12),
+    "bold": ("F2", 11, 0, 0),
+    "bold_spaced": ("F2", 11, 0, 12),
+}
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+DINGBATS_FONT = "F3"  # ZapfDingbats, com a codificação própria da fonte
+
+# Larguras AFM (1/1000 em) dos caracteres ASCII 32-126
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778,
+    722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+    278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667, 611, 778,
+    722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333,
+    278, 333, 584, 556, 333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+_WIDTHS = {"F1": _HELVETICA_WIDTHS, "F2": _HELVETICA_BOLD_WIDTHS}
+_PUNCTUATION_WIDTHS = {"‘": 222, "’": 222, "“": 333, "”": 333, "–": 556, "—": 1000, "…": 1000, "•": 350}
+# caractere: (código na ZapfDingbats, largura AFM); U+F0FB/U+F0FC são o ✗/✓ do Wingdings
+_DINGBATS = {
+    "\u2713": (b"3", 755), "\uf0fc": (b"3", 755), "\u2714": (b"4", 846),
+    "\u2717": (b"7", 571), "\uf0fb": (b"7", 571), "\u2718": (b"8", 677),
+}
+
+
+def _char_width(char: str, font: str) -> int:
+    code = ord(char)
+    if 32 <= code <= 126:
+        return _WIDTHS[font][code - 32]
+    if char in _PUNCTUATION_WIDTHS:
+        return _PUNCTUATION_WIDTHS[char]
+    if char in _DINGBATS:
+        return _DINGBATS[char][1]
+    # Letras acentuadas têm a largura da letra base
+    base = unicodedata.normalize('NFKD', char)[:1]
+    if base and 32 <= ord(base) <= 126:
+        return _WIDTHS[font][ord(base) - 32]
+    return 556
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    return sum(_char_width(char, font) for char in text) * size / 1000
+
+
+def wrap_text(text: str, font: str, size: float, max_width: float) -> list:
+    """Splits a paragraph into lines that fit max_width (line feeds are kept as breaks)."""
+    wrapped = []
+    for paragraph in text.replace('\t', '    ').splitlines() or [""]:
+        current = ""
+        for word in paragraph.split(' '):
+            candidate = f"{current} {word}" if current else word
+            if text_width(candidate, font, size) <= max_width:
+                current = candidate
+                continue
+            if current:
+                wrapped.append(current)
+            # Palavras maiores que a linha (ex.: ____________) são quebradas em pedaços
+            while text_width(word, font, size) > max_width:
+                cut = len(word) - 1
+                while cut > 1 and text_width(word[:cut], font, size) > max_width:
+                    cut -= 1
+                wrapped.append(word[:cut])
+                word = word[cut:]
+            current = word
+        wrapped.append(current)
+    return wrapped
+
+
+def layout_pages(lines: list) -> list:
+    """Places (style, text) lines on pages: returns a list of pages of (font, size, x, y, text)."""
+    pages = [[]]
+    y = PAGE_HEIGHT - MARGIN_Y
+    max_width = PAGE_WIDTH - 2 * MARGIN_X
+    for style_key, text in lines:
+        if style_key == PAGE_BREAK[0]:
+            pages.append([])
+            y = PAGE_HEIGHT - MARGIN_Y
+            continue
+        font, size, space_before, space_after = PDF_STYLES[style_key]
+        leading = size * LINE_HEIGHT
+        if pages[-1]:
+            y -= space_before
+        for text_line in wrap_text(text or "", font, size, max_width):
+            if y - leading < MARGIN_Y:
+                pages.append([])
+                y = PAGE_HEIGHT - MARGIN_Y
+            y -= leading
+            pages[-1].append((font, size, MARGIN_X, y + (leading - size) / 2, text_line))
+        y -= space_after
+    return pages
+
+
+def _winansi(char: str) -> bytes:
+    try:
+        return char.encode('cp1252')
+    except UnicodeEncodeError:
+        # Sem o caractere em WinAnsi, fica a letra base (ő -> o); só então '?'
+        base = unicodedata.normalize('NFKD', char)[:1]
+        return base.encode('cp1252') if base and base != char and ord(base) < 128 else b"?"
+
+
+def _escape(encoded: bytes) -> bytes:
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _pdf_string(text: str) -> bytes:
+    return _escape(b"".join(_winansi(char) for char in text))
+
+
+def _text_runs(text: str, font: str) -> list:
+    """Splits a line into (font, encoded bytes) runs: text in `font`, symbols in DINGBATS_FONT."""
+    runs = []
+    for char in text:
+        run_font, code = (DINGBATS_FONT, _DINGBATS[char][0]) if char in _DINGBATS else (font, _winansi(char))
+        if runs and runs[-1][0] == run_font:
+            runs[-1][1].extend(code)
+        else:
+            runs.append((run_font, bytearray(code)))
+    return runs
+
+
+def _page_content(page: list) -> bytes:
+    commands = [b"BT"]
+    for font, size, x, y, text in page:
+        # Cada Tj avança o cursor pela largura do que escreveu: as partes seguem na mesma linha
+        runs = b" ".join(b"/%s %g Tf %s Tj" % (run_font.encode(), size, _escape(bytes(code)))
+                         for run_font, code in _text_runs(text, font))
+        commands.append(b"1 0 0 1 %.2f %.2f Tm %s" % (x, y, runs or b"/%s %g Tf () Tj" % (font.encode(), size)))
+    commands.append(b"ET")
+    return b"\n".join(commands)
+
+
+def render_pdf(lines: list, title: str = None) -> bytes:
+    """Renders (style, text) lines into the bytes of a PDF document."""
+    pages = layout_pages(lines)
+    objects = []  # o objeto N fica em objects[N - 1]
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")
+    pages_id = add(b"")
+    font_ids = {name: add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base.encode())
+                for name, base in FONTS.items()}
+    font_ids[DINGBATS_FONT] = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /ZapfDingbats >>")
+    fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), font_id) for name, font_id in font_ids.items())
+
+    page_ids = []
+    for page in pages:
+        content = zlib.compress(_page_content(page))
+        content_id = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        page_ids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> "
+                            b"/Contents %d 0 R >>" % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, fonts, content_id)))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids))
+    info_id = add(b"<< /Title %s /Producer (ccb exam generator) >>" % _pdf_string(title or ""))
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, info_id, xref_offset)
+    return bytes(output)
+
+
+# --- Pooled PDF Workers ---
+
+PDF_POOL = WorkerPool(PDF_WORKERS, PDF_MAX_PENDING)
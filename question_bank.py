@@ -0,0 +1,492 @@
+import os
+import json
+import re
+import pickle
+import hashlib
+import struct
+import threading
+import time
+import tempfile
+from bank_format import BankReader, forget_stale_banks, open_bank, write_bank
+from metrics import count, stage
+from shared_cache import SHARED_CACHE, cache_key, shared_get, shared_put
+
+# --- Compiled Question Bank Index ---
+#
+# Cada livro em BOOKS/<livro>/UNIT-*/*.json é lido uma única vez e compilado em
+# um índice invertido ((seção, tópico) -> unidade -> refs) que fica salvo em disco. O índice só é
+# refeito para os arquivos cujo mtime/tamanho mudou.
+#
+# O índice guarda apenas os metadados de cada questão (META_FIELDS e a posição
+# "ref"); o conteúdo completo fica no arquivo binário do livro (bank_format.py),
+# aberto com mmap e decodificado só para as questões sorteadas.
+# Um banco substituído continua no disco por CCB_BANK_GRACE segundos (padrão 600).
+#
+# Índice e banco compilados também são publicados no cache compartilhado
+# (shared_cache.py), indexados pelo conteúdo dos arquivos: uma réplica nova baixa o
+# livro já compilado em vez de ler e normalizar todos os JSON de novo. O que vem do
+# cache compartilhado é só JSON e o banco binário, conferidos antes do uso (nada de pickle).
+
+BOOKS_DIR = "BOOKS"
+INDEX_CACHE_DIR = os.environ.get("CCB_CACHE_DIR", ".cache")
+INDEX_VERSION = 9
+BANK_GRACE_SECONDS = float(os.environ.get("CCB_BANK_GRACE", 600))
+META_FIELDS = ("digest", "id", "section", "unit", "source", "topic", "type", "instructions")
+SHARED_INDEX_MAGIC = b"CCBI"
+_SHARED_HEADER = struct.Struct("<4sI")
+
+_memory_indexes = {}
+_watched_dirs = set()
+_index_lock = threading.Lock()
+_private_cache_dir = None
+_private_dir_lock = threading.Lock()
+
+
+def list_books(directory: str = BOOKS_DIR) -> list:
+    """Returns a list of directories (books) inside the main directory."""
+    if not os.path.exists(directory): return []
+    with stage("list_books"):
+        return [d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))]
+
+
+def section_from_filename(filename: str):
+    """Returns the section (e.g. 'GRAMMAR') encoded at the end of a question file name."""
+    filename_parts = filename.replace('.json', '').split('-')
+    return filename_parts[-1].upper() if len(filename_parts) >= 4 else None
+
+
+def scan_book_files(book_path: str) -> dict:
+    """Returns {relative_path: (mtime_ns, size)} for every question file of a book."""
+    signature = {}
+    with stage("scan_files"):
+        for unit_entry in os.scandir(book_path):
+            if not (unit_entry.name.startswith("UNIT-") and unit_entry.is_dir()):
+                continue
+            for file_entry in os.scandir(unit_entry.path):
+                if file_entry.name.endswith(".json"):
+                    stat = file_entry.stat()
+                    relative_path = f"{unit_entry.name}/{file_entry.name}"
+                    signature[relative_path] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+
+def parse_question_file(book_path: str, relative_path: str) -> dict:
+    """
+    Reads a single question file and returns its index entry, with the questions
+    already normalized (content digest, section, source file, unit folder and 'qa_pairs').
+    """
+    unit_folder, filename = relative_path.split('/')
+    entry = {
+        "unit": unit_folder.split('-')[-1],
+        "section": section_from_filename(filename),
+        "questions": [],
+        "error": None,
+    }
+    try:
+        with stage("parse_json"):
+            with open(os.path.join(book_path, unit_folder, filename), 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw.decode('utf-8'))
+        count("files_read")
+        count("bytes_parsed", len(raw))
+        for q in data.get("questions", []):
+            # Hash do conteúdo original: identifica a questão nos caches de renderização
+            q['digest'] = hashlib.sha1(json.dumps(q, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+            q['section'] = entry["section"]
+            q['source'] = relative_path
+            q['unit'] = entry["unit"]
+            # Normaliza 'qa_pair' -> 'qa_pairs' uma vez, na compilação
+            if 'qa_pair' in q:
+                qa_pair = q.pop('qa_pair')
+                q.setdefault('qa_pairs', qa_pair)
+            entry["questions"].append(q)
+    except Exception as e:
+        # Arquivos inválidos ficam registrados no índice para não serem relidos a cada requisição
+        entry["questions"] = []
+        entry["error"] = str(e)
+    return entry
+
+
+def _compile_lookups(files: dict) -> tuple:
+    """
+    Builds the unit listing, the list of question entries by ref and the inverted
+    index (section, topic) -> {unit folder: refs} from the file entries. Refs are
+    listed in ascending order, which is also the order of the files.
+    """
+    parsed_units = {}
+    questions = []
+    topic_refs = {}
+    for relative_path in sorted(files):
+        entry = files[relative_path]
+        for q in entry["questions"]:
+            questions.append(q)
+            for topic_unit in q["topic"]:
+                unit_refs = topic_refs.setdefault((entry["section"], topic_unit), {})
+                unit_refs.setdefault(entry["unit"], []).append(q["ref"])
+                match = re.match(r"(\d+)([A-Za-z]*)", topic_unit)
+                if match:
+                    num_part, alpha_part = match.groups()
+                    parsed_units.setdefault(num_part, set())
+                    if alpha_part:
+                        parsed_units[num_part].add(alpha_part.upper())
+
+    units = {num_part: sorted(alphas) for num_part, alphas in parsed_units.items()}
+    topic_refs = {key: {unit: tuple(refs) for unit, refs in unit_refs.items()} for key, unit_refs in topic_refs.items()}
+    return units, questions, topic_refs
+
+
+def _content_digest(files: dict) -> str:
+    """Hash of every question in the book: changes only when the content changes."""
+    book_hash = hashlib.sha1()
+    for relative_path in sorted(files):
+        book_hash.update(relative_path.encode('utf-8'))
+        for q in files[relative_path]["questions"]:
+            book_hash.update(q['digest'].encode('ascii'))
+    return book_hash.hexdigest()
+
+
+def _topic_list(topic) -> list:
+    # Sem 'topic', ou com valores que não são códigos, a questão fica sem unidade (como antes
+    # do índice compilado); o validador (bank_validator.py) aponta o problema
+    if isinstance(topic, str):
+        return [topic]
+    return [unit for unit in topic if isinstance(unit, str)] if isinstance(topic, list) else []
+
+
+def question_meta(question_data: dict, ref: int) -> dict:
+    meta = {field: question_data.get(field) for field in META_FIELDS}
+    meta["topic"] = _topic_list(meta["topic"])
+    meta["ref"] = ref
+    return meta
+
+
+def _book_cache_prefix(book_path: str) -> str:
+    book_name = os.path.basename(os.path.normpath(book_path))
+    path_hash = hashlib.sha1(os.path.abspath(book_path).encode('utf-8')).hexdigest()[:10]
+    return f"{book_name}-{path_hash}"
+
+
+def _writable_cache_dir(cache_dir: str) -> str:
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.access(cache_dir, os.W_OK):
+            return cache_dir
+    except OSError:
+        pass
+    # Sem permissão de escrita, índice e banco vão para um diretório temporário privado
+    # deste processo (mkdtemp cria com modo 0700): outro usuário não consegue plantar um índice
+    global _private_cache_dir
+    with _private_dir_lock:
+        if _private_cache_dir is None:
+            _private_cache_dir = tempfile.mkdtemp(prefix="ccb-cache-")
+    return _private_cache_dir
+
+
+def _write_book_bank(book_path: str, questions: list, digest: str, cache_dir: str, bank_bytes: bytes = None) -> str:
+    """
+    Writes the bank file of a book (from the questions, or the ready bank_bytes). Replaced
+    banks stay on disk for BANK_GRACE_SECONDS, so that indexes other processes still hold
+    can be read, and their shared readers here are dropped (not closed).
+    """
+    cache_dir = _writable_cache_dir(cache_dir)
+    prefix = _book_cache_prefix(book_path)
+    bank_path = os.path.join(cache_dir, f"{prefix}-{digest[:12]}-v{INDEX_VERSION}.bank")
+    if not os.path.exists(bank_path):
+        if bank_bytes is None:
+            write_bank(bank_path, questions)
+        else:
+            tmp_path = f"{bank_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(bank_bytes)
+            os.replace(tmp_path, bank_path)
+    else:
+        os.utime(bank_path)  # um banco reaproveitado volta a ser o mais novo
+
+    # Um banco substituído só é apagado BANK_GRACE_SECONDS depois de o seguinte ser gravado:
+    # outros processos (réplicas, workers) podem ainda não ter relido o índice novo
+    banks = []
+    for f in os.listdir(cache_dir):
+        if f.startswith(f"{prefix}-") and f.endswith(".bank"):
+            try:
+                banks.append((os.path.getmtime(os.path.join(cache_dir, f)), os.path.join(cache_dir, f)))
+            except OSError:
+                pass
+    banks.sort(reverse=True)
+    now = time.time()
+    for (replaced_at, _newer), (_mtime, old_bank) in zip(banks, banks[1:]):
+        if old_bank != bank_path and now - replaced_at > BANK_GRACE_SECONDS:
+            try:
+                os.remove(old_bank)
+            except OSError:
+                pass
+    forget_stale_banks(os.path.join(cache_dir, f"{prefix}-"), (bank_path,))
+    return bank_path
+
+
+def build_book_index(book_path: str, signature: dict, previous: dict = None, cache_dir: str = INDEX_CACHE_DIR) -> dict:
+    """
+    Compiles the index and the bank file of a book. Questions of files whose
+    (mtime, size) signature did not change are copied from the previous bank
+    instead of being parsed again.
+    """
+    previous_files = previous["files"] if previous else {}
+    previous_signature = previous["signature"] if previous else {}
+    previous_bank = None
+    if previous_files:
+        try:
+            previous_bank = open_bank(previous["bank_path"])
+        except (OSError, ValueError):
+            previous_files = {}
+
+    files = {}
+    bank_questions = []
+    for relative_path in sorted(signature):
+        if previous_signature.get(relative_path) == signature[relative_path] and relative_path in previous_files:
+            entry = dict(previous_files[relative_path])
+            questions = [previous_bank.question(meta["ref"]) for meta in entry["questions"]]
+        else:
+            entry = parse_question_file(book_path, relative_path)
+            questions = entry["questions"]
+
+        entry["questions"] = [question_meta(q, len(bank_questions) + i) for i, q in enumerate(questions)]
+        bank_questions.extend(questions)
+        files[relative_path] = entry
+
+    digest = _content_digest(files)
+    units, questions, topic_refs = _compile_lookups(files)
+    return {
+        "version": INDEX_VERSION,
+        "digest": digest,
+        "bank_path": _write_book_bank(book_path, bank_questions, digest, cache_dir),
+        "signature": signature,
+        "files": files,
+        "units": units,
+        "questions": questions,
+        "topic_refs": topic_refs,
+    }
+
+
+def load_questions(book_index: dict, metas: list) -> list:
+    """Decodes the full questions of the given index entries from the book's bank file."""
+    if not metas:
+        return []
+    with stage("decode_questions"):
+        bank = open_bank(book_index["bank_path"])
+        return [bank.question(meta["ref"]) for meta in metas]
+
+
+def _index_file_path(book_path: str, cache_dir: str) -> str:
+    return os.path.join(_writable_cache_dir(cache_dir), f"{_book_cache_prefix(book_path)}.index")
+
+
+def _read_index_file(index_path: str):
+    try:
+        with open(index_path, 'rb') as f:
+            index = pickle.load(f)
+        if index.get("version") != INDEX_VERSION or not os.path.exists(index["bank_path"]):
+            return None
+        return index
+    except Exception:
+        return None
+
+
+def _write_index_file(index_path: str, index: dict):
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        # Sem permissão de escrita o índice continua válido apenas em memória
+        pass
+
+
+def _source_hashes(book_path: str, signature: dict, previous: dict = None):
+    """
+    Hash of the raw bytes of each question file. Files whose (mtime, size) did not change
+    reuse the hash stored in the previous index, so a one-file edit reads one file.
+    """
+    previous_signature = previous["signature"] if previous else {}
+    previous_hashes = previous.get("sources", {}) if previous else {}
+    hashes = {}
+    try:
+        for relative_path in sorted(signature):
+            if previous_signature.get(relative_path) == signature[relative_path] and relative_path in previous_hashes:
+                hashes[relative_path] = previous_hashes[relative_path]
+                continue
+            with open(os.path.join(book_path, relative_path), 'rb') as f:
+                hashes[relative_path] = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        # Arquivo removido durante a leitura: compila localmente
+        return None
+    return hashes
+
+
+def _source_digest(source_hashes: dict) -> str:
+    """Hash of the contents of every question file (mtimes differ between replicas, contents do not)."""
+    source_hash = hashlib.sha1()
+    for relative_path in sorted(source_hashes):
+        source_hash.update(relative_path.encode('utf-8'))
+        source_hash.update(source_hashes[relative_path].encode('ascii'))
+    return source_hash.hexdigest()
+
+
+def _shared_index_key(book_path: str, source_digest: str) -> str:
+    return cache_key("book-index", INDEX_VERSION, os.path.basename(os.path.normpath(book_path)), source_digest)
+
+
+def _checked_shared_files(files, signature: dict, bank: BankReader) -> dict:
+    """
+    Validates the file entries of a shared index against the local files and the shared
+    bank; returns them or raises ValueError. Refs must run in order over the whole bank.
+    """
+    bank.check()
+    if not isinstance(files, dict) or set(files) != set(signature):
+        raise ValueError("the shared index lists other files")
+    next_ref = 0
+    for relative_path in sorted(files):
+        entry = files[relative_path]
+        if (not isinstance(entry, dict) or not isinstance(entry.get("questions"), list)
+                or not isinstance(entry.get("unit"), str) or not isinstance(entry.get("section"), (str, type(None)))
+                or not isinstance(entry.get("error"), (str, type(None)))):
+            raise ValueError(f"invalid entry for {relative_path}")
+        for meta in entry["questions"]:
+            if not isinstance(meta, dict) or set(meta) != set(META_FIELDS) | {"ref"} or meta["ref"] != next_ref:
+                raise ValueError(f"invalid question entry in {relative_path}")
+            if (not isinstance(meta["topic"], list) or not all(isinstance(unit, str) for unit in meta["topic"])
+                    or not isinstance(meta["digest"], str)):
+                raise ValueError(f"invalid question entry in {relative_path}")
+            next_ref += 1
+    if next_ref != len(bank):
+        raise ValueError("the shared bank has other questions")
+    return files
+
+
+def _fetch_shared_index(book_path: str, signature: dict, source_digest: str, cache_dir: str):
+    """Returns the index compiled by another process for the same files, or None."""
+    if SHARED_CACHE is None:
+        return None
+    with stage("shared_index"):
+        payload = shared_get(SHARED_CACHE, _shared_index_key(book_path, source_digest))
+        if payload is None:
+            return None
+        try:
+            magic, header_size = _SHARED_HEADER.unpack_from(payload, 0)
+            if magic != SHARED_INDEX_MAGIC:
+                raise ValueError("not a shared book index")
+            header_end = _SHARED_HEADER.size + header_size
+            header = json.loads(payload[_SHARED_HEADER.size:header_end].decode('utf-8'))
+            bank_bytes = bytes(payload[header_end:])
+            if header.get("version") != INDEX_VERSION:
+                return None
+            files = _checked_shared_files(header.get("files"), signature, BankReader(book_path, bank_bytes))
+            digest = _content_digest(files)
+            if digest != header.get("digest"):
+                raise ValueError("the shared index digest does not match its files")
+            units, questions, topic_refs = _compile_lookups(files)
+        except Exception:
+            count("shared_index_rejected")
+            return None
+        index = {
+            "version": INDEX_VERSION,
+            "digest": digest,
+            "bank_path": _write_book_bank(book_path, None, digest, cache_dir, bank_bytes),
+            "signature": signature,
+            "files": files,
+            "units": units,
+            "questions": questions,
+            "topic_refs": topic_refs,
+        }
+    count("shared_index_hits")
+    return index
+
+
+def _publish_shared_index(book_path: str, index: dict, source_digest: str):
+    if SHARED_CACHE is None:
+        return
+    try:
+        with open(index["bank_path"], 'rb') as f:
+            bank_bytes = f.read()
+    except OSError:
+        return
+    # Só os arquivos: unidades e o índice invertido são recalculados por quem baixa
+    header = json.dumps({"version": INDEX_VERSION, "digest": index["digest"], "files": index["files"]},
+                        ensure_ascii=False).encode('utf-8')
+    payload = _SHARED_HEADER.pack(SHARED_INDEX_MAGIC, len(header)) + header + bank_bytes
+    shared_put(SHARED_CACHE, _shared_index_key(book_path, source_digest), payload)
+
+
+def empty_index() -> dict:
+    return {"version": INDEX_VERSION, "digest": None, "bank_path": None, "signature": {}, "sources": {}, "files": {},
+            "units": {}, "questions": [], "topic_refs": {}}
+
+
+def watch_books_dir(books_dir: str, watched: bool = True):
+    """
+    Marks a books directory as watched (see bank_watcher.py). The indexes of a watched
+    directory are served from memory without checking the files, and are refreshed
+    by the watcher through refresh_book_index().
+    """
+    if watched:
+        _watched_dirs.add(os.path.abspath(books_dir))
+    else:
+        _watched_dirs.discard(os.path.abspath(books_dir))
+
+
+def load_book_index(book_name: str, books_dir: str = BOOKS_DIR, cache_dir: str = INDEX_CACHE_DIR) -> dict:
+    """
+    Returns the compiled index of a book. The index is kept in memory and on disk,
+    and only the files whose mtime/size changed since the last build are re-parsed.
+    Full questions are read from it with load_questions().
+    """
+    if not book_name:
+        return empty_index()
+    book_path = os.path.join(books_dir, book_name)
+    if os.path.abspath(books_dir) in _watched_dirs:
+        cached = _memory_indexes.get(book_path)
+        if cached is not None:
+            return cached
+    return refresh_book_index(book_name, books_dir, cache_dir)
+
+
+def refresh_book_index(book_name: str, books_dir: str = BOOKS_DIR, cache_dir: str = INDEX_CACHE_DIR) -> dict:
+    """
+    Checks the files of a book and rebuilds its index if any of them changed. The
+    in-memory index is replaced in a single assignment, so readers never see a
+    partially updated index.
+    """
+    book_path = os.path.join(books_dir, book_name)
+    if not os.path.isdir(book_path):
+        _memory_indexes.pop(book_path, None)
+        return empty_index()
+
+    signature = scan_book_files(book_path)
+    cached = _memory_indexes.get(book_path)
+    if cached is not None and cached["signature"] == signature:
+        return cached
+
+    with _index_lock:
+        cached = _memory_indexes.get(book_path)
+        if cached is not None and cached["signature"] == signature:
+            return cached
+
+        index_path = _index_file_path(book_path, cache_dir)
+        if cached is None:
+            cached = _read_index_file(index_path)
+
+        if cached is not None and cached["signature"] == signature:
+            index = cached
+        else:
+            source_hashes = _source_hashes(book_path, signature, cached) if SHARED_CACHE is not None else None
+            source_digest = _source_digest(source_hashes) if source_hashes is not None else None
+            index = _fetch_shared_index(book_path, signature, source_digest, cache_dir) if source_digest else None
+            if index is None:
+                index = build_book_index(book_path, signature, previous=cached, cache_dir=cache_dir)
+                if source_digest:
+                    _publish_shared_index(book_path, index, source_digest)
+            index["sources"] = source_hashes or {}
+            _write_index_file(index_path, index)
+
+        _memory_indexes[book_path] = index
+        return index
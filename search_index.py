@@ -0,0 +1,192 @@
+import math
+import re
+import threading
+import unicodedata
+from bank_format import open_bank
+from metrics import count, stage
+from question_bank import BOOKS_DIR, load_book_index
+
+# --- Full-Text Question Search ---
+#
+# Índice invertido em memória, por livro, sobre as instruções, o exemplo, os itens,
+# as respostas e as opções de cada questão, com facetas por tipo, tópico e seção.
+# As entradas são indexadas por (arquivo, posição no arquivo): quando o banco muda,
+# só os arquivos cujo conteúdo mudou são tokenizados de novo (update()).
+#
+#   search_questions("ELEMENTARY", "past simple irregular", types=["fill_in_the_blanks_one_word"])
+
+DEFAULT_LIMIT = 50
+FIELD_WEIGHTS = {"instructions": 3, "item": 1, "answer": 2}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    """Lower-case tokens without accents ('Don’t stop!' -> ['don', 't', 'stop'])."""
+    folded = unicodedata.normalize('NFKD', str(text).lower())
+    return _TOKEN.findall("".join(char for char in folded if not unicodedata.combining(char)))
+
+
+def question_terms(q: dict) -> dict:
+    """Weighted term frequencies of a question's searchable text."""
+    weighted = []
+    weighted.append((FIELD_WEIGHTS["instructions"], q.get("instructions")))
+    example = q.get("example")
+    pairs = list(q.get("qa_pairs") or [])
+    if isinstance(example, dict):
+        pairs.append(example)
+    for pair in pairs:
+        if isinstance(pair, dict):
+            weighted.append((FIELD_WEIGHTS["item"], pair.get("item")))
+            weighted.append((FIELD_WEIGHTS["answer"], pair.get("answer")))
+    for option in q.get("options") or []:
+        weighted.append((FIELD_WEIGHTS["answer"], option))
+
+    terms = {}
+    for weight, value in weighted:
+        if value is None:
+            continue
+        for text in (value if isinstance(value, list) else [value]):
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + weight
+    return terms
+
+
+def _file_fingerprint(entry: dict) -> tuple:
+    return tuple(meta["digest"] for meta in entry["questions"])
+
+
+class BookSearchIndex:
+    """
+    Inverted index (token -> {(file, position): weight}) of one book. update() follows
+    the compiled book index, re-tokenizing only the files whose questions changed.
+    """
+
+    def __init__(self):
+        self.digest = None
+        self._postings = {}
+        self._file_terms = {}  # arquivo -> (fingerprint, [termos de cada questão])
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def update(self, book_index: dict) -> int:
+        """Brings the index up to date with a compiled book index; returns how many files were re-indexed."""
+        if book_index["digest"] == self.digest:
+            return 0
+        with self._lock:
+            if book_index["digest"] == self.digest:
+                return 0
+            with stage("search_index_update"):
+                files = book_index["files"]
+                bank = None
+                reindexed = 0
+                for relative_path in list(self._file_terms):
+                    if relative_path not in files:
+                        self._remove_file(relative_path)
+                for relative_path, entry in files.items():
+                    fingerprint = _file_fingerprint(entry)
+                    previous = self._file_terms.get(relative_path)
+                    if previous is not None and previous[0] == fingerprint:
+                        continue
+                    if previous is not None:
+                        self._remove_file(relative_path)
+                    if bank is None and entry["questions"]:
+                        bank = open_bank(book_index["bank_path"])
+                    question_terms_list = [question_terms(bank.question(meta["ref"])) for meta in entry["questions"]]
+                    for position, terms in enumerate(question_terms_list):
+                        for token, weight in terms.items():
+                            self._postings.setdefault(token, {})[(relative_path, position)] = weight
+                    self._file_terms[relative_path] = (fingerprint, question_terms_list)
+                    reindexed += 1
+                self._files = files
+                self.digest = book_index["digest"]
+            count("search_files_indexed", reindexed)
+            return reindexed
+
+    def _remove_file(self, relative_path: str):
+        _fingerprint, question_terms_list = self._file_terms.pop(relative_path)
+        for position, terms in enumerate(question_terms_list):
+            for token in terms:
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop((relative_path, position), None)
+                    if not postings:
+                        del self._postings[token]
+
+    def _matching_tokens(self, term: str, is_prefix: bool) -> list:
+        if term in self._postings and not is_prefix:
+            return [term]
+        if is_prefix:
+            return [token for token in self._postings if token.startswith(term)]
+        return []
+
+    def search(self, query: str, types: list = None, topics: list = None, sections: list = None,
+               limit: int = DEFAULT_LIMIT) -> dict:
+        """
+        Returns the questions that contain every term of the query (the last term also
+        matches as a prefix), best first, with the type/topic/section facets of all the
+        matches. An empty query lists every question that passes the filters.
+        """
+        with stage("search"), self._lock:
+            files, postings = self._files, self._postings
+            terms = tokenize(query or "")
+            if terms:
+                scores = None
+                total_questions = max(1, sum(len(entry["questions"]) for entry in files.values()))
+                for i, term in enumerate(terms):
+                    is_prefix = i == len(terms) - 1 and not query.rstrip().endswith(" ")
+                    term_scores = {}
+                    for token in self._matching_tokens(term, is_prefix):
+                        token_postings = postings.get(token, {})
+                        idf = math.log(1 + total_questions / len(token_postings)) if token_postings else 0
+                        for key, weight in token_postings.items():
+                            term_scores[key] = max(term_scores.get(key, 0), weight * idf)
+                    if scores is None:
+                        scores = term_scores
+                    else:
+                        scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+                    if not scores:
+                        break
+                matches = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            else:
+                matches = [((path, position), 0) for path in sorted(files)
+                           for position in range(len(files[path]["questions"]))]
+
+            hits = []
+            facets = {"type": {}, "topic": {}, "section": {}}
+            for (relative_path, position), score in matches:
+                meta = files[relative_path]["questions"][position]
+                if types and meta["type"] not in types:
+                    continue
+                if topics and not set(meta["topic"] or ()) & set(topics):
+                    continue
+                if sections and meta["section"] not in sections:
+                    continue
+                facets["type"][meta["type"]] = facets["type"].get(meta["type"], 0) + 1
+                facets["section"][meta["section"]] = facets["section"].get(meta["section"], 0) + 1
+                for topic in meta["topic"] or ():
+                    facets["topic"][topic] = facets["topic"].get(topic, 0) + 1
+                if len(hits) < limit:
+                    hits.append(dict(meta, score=round(score, 3)))
+            total = sum(facets["section"].values())
+        count("searches")
+        return {"query": query, "total": total, "hits": hits, "facets": facets}
+
+
+def search_index(book: str, books_dir: str = BOOKS_DIR) -> BookSearchIndex:
+    """Returns the search index of a book, updated against its current compiled index."""
+    key = (books_dir, book)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(key, BookSearchIndex())
+    index.update(load_book_index(book, books_dir))
+    return index
+
+
+def search_questions(book: str, query: str, types: list = None, topics: list = None, sections: list = None,
+                     limit: int = DEFAULT_LIMIT, books_dir: str = BOOKS_DIR) -> dict:
+    """Full-text search over the questions of a book (see BookSearchIndex.search)."""
+    return search_index(book, books_dir).search(query, types, topics, sections, limit)
@@ -0,0 +1,266 @@
+import hashlib
+import os
+import threading
+import time
+from metrics import count
+
+# --- Shared Cross-Process Cache ---
+#
+# Cache de bytes compartilhado entre processos e réplicas do servidor, usado para os
+# índices compilados dos livros e para as provas prontas. Cada réplica mantém ainda
+# um LRU em memória na frente (TieredCache); o backend compartilhado é escolhido por
+# variável de ambiente:
+#
+#   CCB_SHARED_CACHE=disk              (padrão) arquivos em CCB_SHARED_CACHE_DIR, p.ex. um volume comum
+#   CCB_SHARED_CACHE=redis://host:6379/0   servidor compatível com Redis (pacote `redis`)
+#   CCB_SHARED_CACHE=none              só o cache em memória de cada processo
+#   CCB_SHARED_CACHE_BYTES=1073741824  limite total; as entradas menos usadas são removidas
+
+SHARED_CACHE_URL = os.environ.get("CCB_SHARED_CACHE", "disk")
+SHARED_CACHE_DIR = os.environ.get("CCB_SHARED_CACHE_DIR",
+                                  os.path.join(os.environ.get("CCB_CACHE_DIR", ".cache"), "shared"))
+SHARED_CACHE_MAX_BYTES = int(os.environ.get("CCB_SHARED_CACHE_BYTES", 1024 * 1024 * 1024))
+EVICT_LOW_WATER = 0.9  # ao passar do limite, remove até ficar em 90% dele
+
+
+def cache_key(*parts) -> str:
+    """Joins the parts of a key (book digest, exam ID, language...) into a backend key."""
+    return "|".join(str(part) for part in parts)
+
+
+def scan_directory(directory: str, suffix: str = ".bin") -> tuple:
+    """Returns ([(mtime, size, path)], total bytes) of the files ending in suffix under directory."""
+    entries = []
+    total = 0
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    return entries, total
+
+
+def trim_directory(directory: str, max_bytes: int, ttl: float = None, suffix: str = ".bin") -> tuple:
+    """
+    Removes the files not accessed (mtime) for more than ttl seconds and, when the
+    directory is over max_bytes, the least recently used ones down to EVICT_LOW_WATER
+    of it, so that the next writes do not have to scan again. Returns (bytes left, files removed).
+    """
+    entries, total = scan_directory(directory, suffix)
+    entries.sort()
+    limit = int(max_bytes * EVICT_LOW_WATER) if total > max_bytes else max_bytes
+    now = time.time()
+    removed = 0
+    for mtime, size, path in entries:
+        if total <= limit and (ttl is None or now - mtime <= ttl):
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return total, removed
+
+
+class DiskCache:
+    """
+    Byte cache in a directory that several processes (or hosts, on a shared volume) can
+    use at once. Every entry is one file written atomically; reads refresh its mtime,
+    and when the directory grows over max_bytes the least recently used files are removed.
+    """
+
+    def __init__(self, directory: str = SHARED_CACHE_DIR, max_bytes: int = SHARED_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._estimated_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name[:2], f"{name}.bin")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Diretório sem permissão de escrita: o cache em memória continua valendo
+            return
+        with self._lock:
+            if self._estimated_bytes is None:
+                self._estimated_bytes = scan_directory(self.directory)[1]
+            else:
+                self._estimated_bytes += len(value)
+            if self._estimated_bytes > self.max_bytes:
+                # Outras réplicas também gravam aqui: o tamanho real é medido no próprio diretório
+                self._estimated_bytes = trim_directory(self.directory, self.max_bytes)[0]
+
+    def clear(self):
+        with self._lock:
+            for _mtime, _size, path in scan_directory(self.directory)[0]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._estimated_bytes = 0
+
+
+# Gravação, contagem de bytes e remoção dos menos usados num único script Lua: o
+# servidor executa tudo de uma vez, então réplicas gravando a mesma chave ao mesmo
+# tempo não desencontram o contador. (As chaves removidas não vêm em KEYS: o script
+# supõe um Redis sem cluster.)
+_REDIS_PUT_SCRIPT = """
+local previous = redis.call('STRLEN', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+local total = redis.call('INCRBY', KEYS[3], string.len(ARGV[1]) - previous)
+if total > tonumber(ARGV[4]) then
+    while total > tonumber(ARGV[5]) do
+        local oldest = redis.call('ZPOPMIN', KEYS[2], 1)
+        if #oldest == 0 then break end
+        local old_key = ARGV[6] .. oldest[1]
+        total = redis.call('DECRBY', KEYS[3], redis.call('STRLEN', old_key))
+        redis.call('DEL', old_key)
+    end
+end
+return total
+"""
+
+
+class RedisCache:
+    """
+    Byte cache on a Redis-compatible server. Access times are kept in a sorted set and
+    the total size in a counter, so that every replica evicts the least recently used
+    entries once max_bytes is exceeded; each put runs as one atomic script. `client`
+    may be any object with the redis-py API (e.g. fakeredis.FakeRedis() as a local
+    stand-in, which needs `lupa` for scripts); otherwise one is created from url.
+    """
+
+    def __init__(self, url: str = None, max_bytes: int = SHARED_CACHE_MAX_BYTES, prefix: str = "ccb:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CCB_SHARED_CACHE=redis://... requires the 'redis' package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._client = client
+        self._prefix = prefix
+        self._lru_key = f"{prefix}lru"
+        self._size_key = f"{prefix}bytes"
+        self._put_script = client.register_script(_REDIS_PUT_SCRIPT)
+
+    def get(self, key: str):
+        value = self._client.get(self._prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._client.zadd(self._lru_key, {key: time.time()})
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        self._put_script(keys=[self._prefix + key, self._lru_key, self._size_key],
+                         args=[value, time.time(), key, self.max_bytes, int(self.max_bytes * EVICT_LOW_WATER),
+                               self._prefix])
+
+    def clear(self):
+        keys = self._client.zrange(self._lru_key, 0, -1)
+        for key in keys:
+            self._client.delete(self._prefix + (key.decode('utf-8') if isinstance(key, bytes) else key))
+        self._client.delete(self._lru_key, self._size_key)
+
+
+def open_shared_cache(url: str = SHARED_CACHE_URL, directory: str = SHARED_CACHE_DIR,
+                      max_bytes: int = SHARED_CACHE_MAX_BYTES):
+    """Creates the backend named by url ('disk', 'none' or a redis:// URL); None means no shared cache."""
+    if not url or url == "none":
+        return None
+    if url == "disk":
+        return DiskCache(directory, max_bytes)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, max_bytes)
+    raise ValueError(f"Unknown CCB_SHARED_CACHE backend: {url!r}")
+
+
+def shared_get(backend, key: str):
+    try:
+        return backend.get(key)
+    except Exception:
+        count("shared_cache_errors")
+        return None
+
+
+def shared_put(backend, key: str, value: bytes):
+    try:
+        backend.put(key, value)
+    except Exception:
+        count("shared_cache_errors")
+
+
+class TieredCache:
+    """
+    In-process LRUByteCache in front of a shared backend. Keys are tuples of parts
+    (see cache_key); entries found in the shared backend are promoted to memory. A
+    failing backend (e.g. Redis unreachable) only costs a cache miss.
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: tuple):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = shared_get(self.shared, cache_key(*key))
+            if value is not None:
+                count("shared_cache_hits")
+                self.local.put(key, value)
+        return value
+
+    def put(self, key: tuple, value: bytes):
+        self.local.put(key, value)
+        if self.shared is not None:
+            shared_put(self.shared, cache_key(*key), value)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def __len__(self):
+        return len(self.local)
+
+
+SHARED_CACHE = open_shared_cache()
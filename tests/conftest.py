@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+import tempfile
+import pytest
+
+# Os módulos ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Índices, bancos e caches dos testes não se misturam com os do .cache do repositório
+os.environ.setdefault("CCB_CACHE_DIR", tempfile.mkdtemp(prefix="ccb-tests-"))
+os.environ.setdefault("CCB_WARMUP", "0")
+
+REPO_BOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "BOOKS")
+
+
+def question(question_id: int, topic, section: str = "GRAMMAR", q_type: str = "fill_in_the_blanks_one_word",
+             **fields) -> dict:
+    """A small question in the format of the files in BOOKS/."""
+    q = {"id": question_id, "section": section, "topic": topic, "type": q_type,
+         "instructions": f"Complete the sentences ({question_id}).",
+         "qa_pairs": [{"item": f"Item {question_id} ___.", "answer": "is"}]}
+    if topic is None:
+        del q["topic"]
+    q.update(fields)
+    return q
+
+
+@pytest.fixture
+def make_book(tmp_path):
+    """Writes a book under tmp_path/BOOKS: make_book("B", {"UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json": [q...]})."""
+    books_dir = tmp_path / "BOOKS"
+
+    def write(name: str, files: dict) -> str:
+        for relative_path, questions in files.items():
+            path = books_dir / name / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({"questions": questions}), encoding="utf-8")
+        return str(books_dir)
+
+    return write
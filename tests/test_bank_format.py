@@ -0,0 +1,36 @@
+import pytest
+from bank_format import BankReader, write_bank
+
+QUESTIONS = [
+    {"type": "multiple_choice", "instructions": "Choose the right option.", "digest": "a" * 40,
+     "questions": [{"text": "She ___ home.", "options": ["go", "goes", "went"], "answer": "goes"}]},
+    {"type": "fill_in", "points": -3, "weight": 0.5, "extra": None, "active": True, "draft": False,
+     "tags": [], "meta": {}, "text": "Acentuação — ção, é \U0001F600"},
+    {"type": "fill_in", "points": 2 ** 40, "text": "Acentuação — ção, é \U0001F600"},
+]
+
+
+def test_write_bank_round_trip(tmp_path):
+    path = str(tmp_path / "book.bank")
+    write_bank(path, QUESTIONS)
+    reader = BankReader(path)
+    try:
+        reader.check()
+        assert len(reader) == len(QUESTIONS)
+        assert [reader.question(ref) for ref in range(len(reader))] == QUESTIONS
+        with pytest.raises(IndexError):
+            reader.question(len(QUESTIONS))
+    finally:
+        reader.close()
+
+
+def test_bank_from_bytes_matches_file(tmp_path):
+    path = str(tmp_path / "book.bank")
+    write_bank(path, QUESTIONS)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert BankReader(path, data).question(1) == QUESTIONS[1]
+    with pytest.raises(ValueError):
+        BankReader(path, data[:-8]).check()
+    with pytest.raises(ValueError):
+        BankReader(path, b"junk" + data[4:])
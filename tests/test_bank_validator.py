@@ -0,0 +1,29 @@
+import bank_validator
+from bank_validator import ERROR, validate_book
+from conftest import question
+
+GRAMMAR_1 = "UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json"
+
+
+def _messages(report: dict) -> list:
+    return [(p["level"], p["file"], p["question"], p["message"]) for p in report["problems"]]
+
+
+def test_missing_topic_is_reported(make_book, tmp_path):
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, ["1A"]), question(2, None)]})
+    report = validate_book("B", books_dir, str(tmp_path / "cache"))
+    assert (ERROR, GRAMMAR_1, 2, "missing 'topic'") in _messages(report)
+    assert report["errors"] == 1 and report["questions"] == 2
+
+
+def test_index_failure_is_reported_per_file(make_book, tmp_path, monkeypatch):
+    def broken_refresh(book, books_dir, cache_dir):
+        raise TypeError("bad topic")
+
+    monkeypatch.setattr(bank_validator, "refresh_book_index", broken_refresh)
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, ["1A"]), question(2, None)]})
+    report = validate_book("B", books_dir, str(tmp_path / "cache"))
+    messages = _messages(report)
+    assert (ERROR, None, None, "the book index could not be compiled: TypeError: bad topic") in messages
+    assert (ERROR, GRAMMAR_1, 2, "missing 'topic'") in messages
+    assert report["bank_path"] is None
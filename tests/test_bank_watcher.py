@@ -0,0 +1,72 @@
+import threading
+import time
+import bank_watcher
+from bank_watcher import BankWatcher
+from conftest import question
+
+GRAMMAR_1 = "UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json"
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _start(books_dir: str, tmp_path) -> tuple:
+    refreshed = []
+    watcher = BankWatcher(books_dir, str(tmp_path / "cache"), debounce=0.05, poll_interval=0.05)
+    watcher.add_listener(lambda book, index: refreshed.append((book, len(index["questions"]))))
+    return watcher.start(), refreshed
+
+
+def test_watchdog_events_refresh_the_book_without_polling(make_book, tmp_path, monkeypatch):
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, "1A")]})
+    listed = []
+    list_books = bank_watcher.list_books
+    monkeypatch.setattr(bank_watcher, "list_books", lambda directory: listed.append(directory) or list_books(directory))
+    watcher, refreshed = _start(books_dir, tmp_path)
+    try:
+        assert watcher._observer is not None
+        time.sleep(0.3)  # vários poll_interval sem eventos: nenhum livro é verificado
+        assert len(listed) == 1 and refreshed == []
+        make_book("B", {GRAMMAR_1: [question(1, "1A"), question(2, "1A")]})
+        assert _wait_for(lambda: ("B", 2) in refreshed)
+        assert len(listed) == 1
+    finally:
+        watcher.stop()
+
+
+def test_without_watchdog_books_are_polled(make_book, tmp_path, monkeypatch):
+    monkeypatch.setattr(bank_watcher, "Observer", None)
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, "1A")]})
+    watcher, refreshed = _start(books_dir, tmp_path)
+    try:
+        make_book("B", {GRAMMAR_1: [question(1, "1A"), question(2, "1A"), question(3, "1A")]})
+        assert _wait_for(lambda: ("B", 3) in refreshed)
+    finally:
+        watcher.stop()
+
+
+def test_background_start_does_not_wait_for_the_initial_build(make_book, tmp_path, monkeypatch):
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, "1A")]})
+    release, built = threading.Event(), []
+    load_book_index = bank_watcher.load_book_index
+
+    def slow_load(book, books_dir, cache_dir):
+        release.wait(5)
+        built.append(book)
+        return load_book_index(book, books_dir, cache_dir)
+
+    monkeypatch.setattr(bank_watcher, "load_book_index", slow_load)
+    watcher = BankWatcher(books_dir, str(tmp_path / "cache")).start(background=True)
+    try:
+        assert built == []
+        release.set()
+        assert _wait_for(lambda: built == ["B"])
+    finally:
+        release.set()
+        watcher.stop()
@@ -0,0 +1,43 @@
+import io
+import zipfile
+from docx import Document
+from docx_renderer import PAGE_BREAK, lines_xml
+from docx_stream import iter_docx, write_docx
+
+LINES = [
+    ("title", "Exam & <Answers>"),
+    ("bold_spaced", "1. Complete the sentences."),
+    ("line", "a) She ____ (go)\tto school."),
+    ("line", "two\nlines"),
+    ("line", "  leading spaces"),
+    PAGE_BREAK,
+    ("line_spaced", "Acentuação: ção, é, ü — ok"),
+]
+TEXTS = [text for _style, text in LINES if text is not None]
+
+
+def _document_texts(data: bytes) -> list:
+    return [p.text for p in Document(io.BytesIO(data)).paragraphs if p.text]
+
+
+def test_write_docx_round_trip():
+    output = io.BytesIO()
+    write_docx(output, [lines_xml(LINES[:3]), lines_xml(LINES[3:])])
+    data = output.getvalue()
+    assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+    assert _document_texts(data) == TEXTS
+
+
+def test_iter_docx_matches_write_docx():
+    fragments = [lines_xml([line]) for line in LINES] * 50
+    output = io.BytesIO()
+    write_docx(output, fragments)
+    streamed = b"".join(iter_docx(fragments, chunk_size=1024))
+    assert zipfile.ZipFile(io.BytesIO(streamed)).testzip() is None
+    assert _document_texts(streamed) == _document_texts(output.getvalue()) == TEXTS * 50
+
+
+def test_control_characters_are_dropped():
+    output = io.BytesIO()
+    write_docx(output, [lines_xml([("line", "bad\x00\x0bchars")])])
+    assert _document_texts(output.getvalue()) == ["badchars"]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import exam_api
+from exam_api import ExamApi
+from exam_jobs import JobQueue
+from exam_store import ExamStore
+
+
+def _call(api: ExamApi, method: str, path: str, body: dict = None, query: bytes = b"") -> list:
+    """Runs one request through the ASGI app and returns the messages it sent."""
+    sent = []
+    request = json.dumps(body).encode() if body is not None else b""
+
+    async def receive():
+        return {"type": "http.request", "body": request, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query}
+    asyncio.run(api(scope, receive, send))
+    return sent
+
+
+def _json(messages: list) -> tuple:
+    return messages[0]["status"], json.loads(messages[1]["body"])
+
+
+def test_unknown_units_are_rejected():
+    status, payload = _json(_call(ExamApi(), "POST", "/exams", {"book": "ELEMENTARY", "units": ["99"]}))
+    assert status == 400 and "99" in payload["error"]
+
+
+def test_finished_jobs_are_discarded():
+    queue = JobQueue()
+    api = ExamApi(queue=queue)
+    messages = _call(api, "POST", "/exams", {"book": "ELEMENTARY", "units": ["1"], "seed": 7})
+    assert messages[0]["status"] == 200
+    assert queue._jobs == {} and api._inflight == {}
+    queue.shutdown()
+
+
+def test_booklet_failure_after_start_sends_one_response(monkeypatch):
+    def broken_booklet(book, lang, books_dir):
+        yield b"PK"
+        raise RuntimeError("bank vanished")
+
+    monkeypatch.setattr(exam_api, "stream_answer_key_booklet", broken_booklet)
+    messages = _call(ExamApi(), "GET", "/books/ELEMENTARY/answer-key")
+    starts = [message for message in messages if message["type"] == "http.response.start"]
+    assert [start["status"] for start in starts] == [200]
+    assert messages[-1].get("more_body") is True  # sem a parte final: a transferência fica incompleta
+
+
+def test_stored_document_is_streamed_from_disk(tmp_path, monkeypatch):
+    store = ExamStore(str(tmp_path))
+    monkeypatch.setattr(exam_api, "EXAM_STORE", store)
+    handle = store.put(b"0123456789")
+    messages = _call(ExamApi(chunk_size=4), "GET", f"/documents/{handle}", query=b"filename=../prova.pdf")
+    headers = dict(messages[0]["headers"])
+    assert messages[0]["status"] == 200
+    assert headers[b"content-type"] == b"application/pdf"
+    assert headers[b"content-disposition"] == b'attachment; filename="prova.pdf"'
+    assert b"".join(message.get("body", b"") for message in messages[1:]) == b"0123456789"
+    assert _json(_call(ExamApi(), "GET", "/documents/not-a-handle"))[0] == 404
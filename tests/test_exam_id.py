@@ -0,0 +1,43 @@
+import pytest
+from exam_generator import SAMPLER_VERSION, batch_exam_ids, exam_id_request, make_exam_id, parse_exam_id
+
+UNITS = ["1A", "1B", "2A"]
+CONFIG = {"grammar": 3, "vocabulary": 2}
+
+
+@pytest.mark.parametrize("sampler, variant", [(1, None), (SAMPLER_VERSION, None), (1, 2), (SAMPLER_VERSION, 12)])
+def test_exam_id_round_trip(sampler, variant):
+    exam_id = make_exam_id("ELEMENTARY", UNITS, CONFIG, 123456, sampler, variant)
+    params = parse_exam_id(exam_id)
+    assert (params["book"], params["seed"], params["sampler"], params["variant"]) == \
+        ("ELEMENTARY", 123456, sampler, variant)
+    assert params["questions_config"] == CONFIG
+
+
+def test_batch_versions_have_their_own_ids():
+    assert make_exam_id("ELEMENTARY", UNITS, CONFIG, 42, SAMPLER_VERSION, 2).endswith("-S2-V02")
+
+
+@pytest.mark.parametrize("seed_code", ["S2", "V02"])
+def test_legacy_seed_that_looks_like_a_marker(seed_code):
+    seed = int(seed_code, 36)
+    params = parse_exam_id(make_exam_id("ELEMENTARY", UNITS, CONFIG, seed, 1))
+    assert (params["seed"], params["sampler"], params["variant"]) == (seed, 1, None)
+
+
+def test_unknown_sampler_is_rejected():
+    with pytest.raises(ValueError):
+        parse_exam_id(make_exam_id("ELEMENTARY", UNITS, CONFIG, 42, 9))
+
+
+def test_version_id_reproduces_only_that_version():
+    version_id = make_exam_id("ELEMENTARY", UNITS, CONFIG, 42, SAMPLER_VERSION, 2)
+    assert (exam_id_request(version_id, variants=5)["variants"], exam_id_request(version_id)["variant"]) == (1, 2)
+    plain_id = make_exam_id("ELEMENTARY", UNITS, CONFIG, 42, SAMPLER_VERSION)
+    assert exam_id_request(plain_id, variants=5)["variants"] == 5
+
+
+def test_each_version_of_a_batch_has_its_id():
+    exam_ids = batch_exam_ids("ELEMENTARY", UNITS, CONFIG, 42, 3)
+    assert [parse_exam_id(exam_id)["variant"] for exam_id in exam_ids] == [1, 2, 3]
+    assert batch_exam_ids("ELEMENTARY", UNITS, CONFIG, 42) == [make_exam_id("ELEMENTARY", UNITS, CONFIG, 42)]
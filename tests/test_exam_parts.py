@@ -0,0 +1,56 @@
+import io
+import zipfile
+import pytest
+from docx import Document
+from conftest import question
+from docx_renderer import PAGE_BREAK
+from exam_generator import document_filename, document_parts, exam_layout, generate_exam
+from i18n import catalogue
+
+QUESTIONS = [question(1, "1A", instructions="Complete with the verb."),
+             question(2, "1A", section="VOCABULARY", instructions="Match the words.")]
+
+
+def _kinds(blocks: list) -> list:
+    return [block[0] for block in blocks]
+
+
+def _texts(data: bytes) -> str:
+    return "\n".join(p.text for p in Document(io.BytesIO(data)).paragraphs)
+
+
+def test_split_is_a_student_copy_and_a_key():
+    assert document_parts("split") == ("student", "key")
+    assert document_parts("full") == ("full",)
+    with pytest.raises(ValueError):
+        document_parts("teacher")
+
+
+def test_layout_of_each_part():
+    full_questions, full_answers = exam_layout("B", ["1A"], QUESTIONS, part="full")
+    assert _kinds(full_questions).count("question") == 2 and _kinds(full_answers).count("answers") == 2
+    assert full_answers[0][1][0] == PAGE_BREAK
+
+    student_questions, student_answers = exam_layout("B", ["1A"], QUESTIONS, part="student")
+    assert student_questions == full_questions and student_answers == []
+
+    key_questions, key_answers = exam_layout("B", ["1A"], QUESTIONS, part="key")
+    assert "question" not in _kinds(key_questions) and _kinds(key_answers).count("answers") == 2
+    assert PAGE_BREAK not in key_answers[0][1]  # o gabarito separado começa na primeira página
+    name_date = catalogue()["docx_name_date"]
+    assert name_date in [text for _style, text in student_questions[0][1]]
+    assert name_date not in [text for _style, text in key_questions[0][1]]
+
+
+def test_split_exam_zips_the_student_copy_and_the_key(make_book):
+    books_dir = make_book("B", {"UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json": QUESTIONS[:1],
+                                "UNIT-1/UNIDADE-1-QUESTAO-2-VOCABULARY.json": QUESTIONS[1:]})
+    _exam_id, zip_io = generate_exam("B", ["1A"], {"grammar": 1, "vocabulary": 1}, seed=3, books_dir=books_dir,
+                                     part="split")
+    documents = zipfile.ZipFile(zip_io)
+    names = [document_filename(part, "B", ["1A"], "pt_BR", "docx") for part in ("student", "key")]
+    assert documents.namelist() == names and names[0] != names[1]
+    student, key = (_texts(documents.read(name)) for name in names)
+    key_title = catalogue()["docx_answer_key_title"]
+    assert "Complete with the verb." in student and key_title not in student
+    assert key_title in key and "Complete with the verb." not in key
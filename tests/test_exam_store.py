@@ -0,0 +1,57 @@
+import os
+import time
+import pytest
+from exam_store import ExamStore, download_url
+
+
+def _age(store: ExamStore, handle: str, seconds: float):
+    """Moves a document's last access back in time."""
+    past = time.time() - seconds
+    os.utime(store._path(handle), (past, past))
+
+
+def test_put_and_open_round_trip(tmp_path):
+    store = ExamStore(str(tmp_path), max_bytes=1024, ttl=60)
+    handle = store.put(b"exam")
+    with store.open(handle) as f:
+        assert f.read() == b"exam"
+
+
+def test_expired_document_is_discarded(tmp_path):
+    store = ExamStore(str(tmp_path), max_bytes=1024, ttl=60)
+    handle = store.put(b"exam")
+    _age(store, handle, 120)
+    assert store.open(handle) is None
+    assert not os.path.exists(store._path(handle))
+
+
+def test_sweep_removes_only_expired_documents(tmp_path):
+    store = ExamStore(str(tmp_path), max_bytes=1024, ttl=60)
+    old, recent = store.put(b"old"), store.put(b"recent")
+    _age(store, old, 120)
+    store.sweep()
+    assert store.open(old) is None
+    assert store.open(recent) is not None
+
+
+def test_writes_over_the_limit_evict_least_recently_used(tmp_path):
+    store = ExamStore(str(tmp_path), max_bytes=300, ttl=3600)
+    handles = [store.put(b"x" * 100) for _ in range(3)]
+    for age, handle in zip((30, 10, 20), handles):
+        _age(store, handle, age)
+    store.put(b"x" * 100)  # 400 bytes: abaixo da marca inferior sobram os mais recentes
+    remaining = [handle for handle in handles if os.path.exists(store._path(handle))]
+    assert handles[0] not in remaining and handles[1] in remaining
+    assert store._estimated_bytes <= 300
+
+
+def test_invalid_handle_is_rejected(tmp_path):
+    store = ExamStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.open("../../etc/passwd")
+
+
+def test_download_url_needs_a_base_url():
+    assert download_url("a" * 32, "prova 1.docx", None) is None
+    assert download_url("a" * 32, "prova 1.docx", "https://host/api/") == \
+        f"https://host/api/documents/{'a' * 32}?filename=prova%201.docx"
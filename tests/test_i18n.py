@@ -0,0 +1,35 @@
+import json
+import pytest
+import i18n
+
+
+@pytest.fixture
+def locales(tmp_path, monkeypatch):
+    """Small catalogues in a temporary locales directory, with nothing loaded yet."""
+    catalogues = {"en_GB": {"title": "Title", "only_en": "English only"},
+                  "pt_BR": {"title": "Título"},
+                  "es_ES": {"title": "Título ES"}}
+    for code, strings in catalogues.items():
+        (tmp_path / f"{code}.json").write_text(json.dumps(strings), encoding="utf-8")
+    monkeypatch.setattr(i18n, "LOCALES_DIR", str(tmp_path))
+    monkeypatch.setattr(i18n, "LANGUAGE_NAMES", {code: code for code in catalogues})
+    monkeypatch.setattr(i18n, "_catalogues", {})
+    return tmp_path
+
+
+def test_missing_key_falls_back_to_en_gb(locales):
+    assert i18n.translate("title", "pt_BR") == "Título"
+    assert i18n.translate("only_en", "pt_BR") == "English only"
+
+
+def test_unknown_language_uses_en_gb(locales):
+    assert i18n.translate("title", "xx_XX") == "Title"
+
+
+def test_key_missing_everywhere_is_marked(locales):
+    assert i18n.translate("nowhere", "pt_BR") == "Missing_Key: nowhere"
+
+
+def test_catalogues_are_read_on_first_use(locales):
+    i18n.translate("title", "pt_BR")
+    assert set(i18n._catalogues) == {"en_GB", "pt_BR"}
@@ -0,0 +1,58 @@
+import re
+import zlib
+from conftest import REPO_BOOKS_DIR
+from docx_renderer import PAGE_BREAK
+from exam_generator import render_exam
+from pdf_renderer import render_pdf
+from question_bank import load_book_index, load_questions
+
+
+def _xref(pdf: bytes) -> tuple:
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[startxref:].startswith(b"xref\n")
+    count = int(re.match(rb"xref\n0 (\d+)\n", pdf[startxref:]).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n \n", pdf[startxref:])
+    return count, [int(offset) for offset in entries]
+
+
+def test_xref_offsets_point_at_their_objects():
+    lines = [("title", "Exam (1) \\ back"), ("line", "word " * 400), PAGE_BREAK, ("bold", "Acentuação")]
+    pdf = render_pdf(lines, title="Exam")
+    assert pdf.startswith(b"%PDF-1.4\n")
+    count, offsets = _xref(pdf)
+    assert len(offsets) == count - 1
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[offset:].startswith(b"%d 0 obj\n" % number)
+
+
+def test_streams_have_their_declared_length():
+    pdf = render_pdf([("line", "text")] * 200)
+    for match in re.finditer(rb"<< /Length (\d+) /Filter /FlateDecode >>\nstream\n", pdf):
+        start = match.end()
+        length = int(match.group(1))
+        assert pdf[start + length:start + length + 10] == b"\nendstream"
+        assert b"Tj" in zlib.decompress(pdf[start:start + length])
+    assert pdf.count(b"/Type /Page ") >= 2
+
+
+def _page_streams(pdf: bytes) -> bytes:
+    return b"\n".join(zlib.decompress(pdf[match.end():match.end() + int(match.group(1))])
+                      for match in re.finditer(rb"<< /Length (\d+) /Filter /FlateDecode >>\nstream\n", pdf))
+
+
+def test_bank_symbols_are_rendered_as_dingbats():
+    book_index = load_book_index("ELEMENTARY", REPO_BOOKS_DIR)
+    metas = [meta for meta in book_index["questions"] if "\u2713" in (meta["instructions"] or "")][:1]
+    assert metas, "the shipped bank has a 'Tick (\u2713)' question"
+    pdf = render_exam("ELEMENTARY", metas[0]["topic"], load_questions(book_index, metas), output_format="pdf",
+                      use_pool=False).getvalue()
+    content = _page_streams(pdf)
+    assert b"/BaseFont /ZapfDingbats" in pdf
+    assert b"Tick \\() Tj /F3 11 Tf (3) Tj /F2 11 Tf (\\) the correct sentence.) Tj" in content
+    assert b"Tick \\(?" not in content
+
+
+def test_wingdings_check_mark_and_accents():
+    content = _page_streams(render_pdf([("line", "Tick (\uf0fc) \u0151 \u2603")]))
+    assert b"/F3 11 Tf (3) Tj" in content
+    assert b"(\\) o ?) Tj" in content
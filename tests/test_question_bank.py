@@ -0,0 +1,70 @@
+import json
+import os
+import question_bank
+from bank_format import open_bank
+from conftest import question
+from question_bank import build_book_index, load_book_index, load_questions, refresh_book_index, scan_book_files
+
+GRAMMAR_1 = "UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json"
+
+
+def test_question_without_topic_does_not_break_the_book(make_book, tmp_path):
+    books_dir = make_book("B", {GRAMMAR_1: [question(1, ["1A"]), question(2, None), question(3, [7, "1B", None]),
+                                            question(4, "1C")]})
+    index = load_book_index("B", books_dir, str(tmp_path / "cache"))
+    assert index["units"] == {"1": ["A", "B", "C"]}
+    assert [meta["topic"] for meta in index["questions"]] == [["1A"], [], ["1B"], ["1C"]]
+    assert [q["id"] for q in load_questions(index, index["questions"])] == [1, 2, 3, 4]
+
+
+def _rebuild(books_dir: str, cache_dir: str, n_questions: int) -> dict:
+    path = os.path.join(books_dir, "B", GRAMMAR_1)
+    with open(path, 'w', encoding="utf-8") as f:
+        json.dump({"questions": [question(i, "1A") for i in range(1, n_questions + 1)]}, f)
+    return refresh_book_index("B", books_dir, cache_dir)
+
+
+def test_replaced_banks_stay_readable(make_book, tmp_path):
+    books_dir, cache_dir = make_book("B", {GRAMMAR_1: [question(1, "1A")]}), str(tmp_path / "cache")
+    first = load_book_index("B", books_dir, cache_dir)
+    held = open_bank(first["bank_path"])
+    for n_questions in (2, 3):
+        _rebuild(books_dir, cache_dir, n_questions)
+    # Quem ainda segura o leitor antigo continua lendo, e o arquivo espera o período de carência
+    assert held.question(first["questions"][0]["ref"])["id"] == 1
+    assert os.path.exists(first["bank_path"])
+
+
+def test_replaced_banks_are_removed_after_the_grace_period(make_book, tmp_path, monkeypatch):
+    books_dir, cache_dir = make_book("B", {GRAMMAR_1: [question(1, "1A")]}), str(tmp_path / "cache")
+    first = load_book_index("B", books_dir, cache_dir)
+    monkeypatch.setattr(question_bank, "BANK_GRACE_SECONDS", -1)
+    latest = _rebuild(books_dir, cache_dir, 2)
+    assert not os.path.exists(first["bank_path"]) and os.path.exists(latest["bank_path"])
+
+
+def test_incremental_rebuild_reparses_only_changed_files(make_book, tmp_path, monkeypatch):
+    monkeypatch.setattr(question_bank, "SHARED_CACHE", None)
+    files = {f"UNIT-{unit}/UNIDADE-{unit}-QUESTAO-1-GRAMMAR.json": [question(unit * 10 + i, f"{unit}A") for i in range(2)]
+             for unit in (1, 2, 3)}
+    books_dir, cache_dir = make_book("B", files), str(tmp_path / "cache")
+    load_book_index("B", books_dir, cache_dir)
+
+    parsed = []
+    parse = question_bank.parse_question_file
+    monkeypatch.setattr(question_bank, "parse_question_file",
+                        lambda book_path, relative_path: parsed.append(relative_path) or parse(book_path, relative_path))
+    make_book("B", {"UNIT-2/UNIDADE-2-QUESTAO-1-GRAMMAR.json": [question(99, "2B", instructions="Edited.")]})
+    edited = refresh_book_index("B", books_dir, cache_dir)
+    assert parsed == ["UNIT-2/UNIDADE-2-QUESTAO-1-GRAMMAR.json"]
+
+    os.remove(os.path.join(books_dir, "B", "UNIT-3/UNIDADE-3-QUESTAO-1-GRAMMAR.json"))
+    removed = refresh_book_index("B", books_dir, cache_dir)
+    assert parsed == ["UNIT-2/UNIDADE-2-QUESTAO-1-GRAMMAR.json"]
+    assert edited["units"] == {"1": ["A"], "2": ["B"], "3": ["A"]} and removed["units"] == {"1": ["A"], "2": ["B"]}
+
+    book_path = os.path.join(books_dir, "B")
+    cold = build_book_index(book_path, scan_book_files(book_path), cache_dir=str(tmp_path / "cold"))
+    for key in ("digest", "files", "units", "questions", "topic_refs"):
+        assert removed[key] == cold[key]
+    assert load_questions(removed, removed["questions"]) == load_questions(cold, cold["questions"])
@@ -0,0 +1,55 @@
+import random
+from collections import Counter
+from conftest import question
+from exam_generator import SAMPLER_VERSION, exam_selection, make_exam_id, parse_exam_id, sample_balanced
+
+
+def _meta(question_id: int, q_type: str, topic: str, instructions: str = None) -> dict:
+    """Index entry as sample_balanced sees it."""
+    return {"ref": question_id, "type": q_type, "topic": [topic],
+            "instructions": instructions or f"Instructions {question_id}"}
+
+
+def test_quotas_are_filled_evenly():
+    pool = [_meta(i, f"type{i % 3}", f"1{'AB'[i % 2]}") for i in range(12)]
+    for seed in range(20):
+        chosen = sample_balanced(pool, 6, ["1A", "1B"], random.Random(seed))
+        assert len(chosen) == 6 and len({q["ref"] for q in chosen}) == 6
+        assert set(Counter(q["type"] for q in chosen).values()) == {2}
+        assert set(Counter(q["topic"][0] for q in chosen).values()) == {3}
+
+
+def test_rare_types_are_not_crowded_out():
+    pool = [_meta(i, "common", "1A") for i in range(10)] + [_meta(10 + i, f"rare{i % 2}", "1A") for i in range(4)]
+    for seed in range(20):
+        types = Counter(q["type"] for q in sample_balanced(pool, 6, None, random.Random(seed)))
+        assert types == {"common": 2, "rare0": 2, "rare1": 2}
+
+
+def test_pool_that_cannot_satisfy_the_quotas_still_fills_the_exam():
+    pool = [_meta(i, "common", "1A") for i in range(5)] + [_meta(5, "rare", "1A")]
+    chosen = sample_balanced(pool, 4, None, random.Random(1))
+    assert len(chosen) == 4 and len({q["ref"] for q in chosen}) == 4
+    assert "rare" in {q["type"] for q in chosen}
+
+
+def test_repeated_instructions_are_used_last():
+    pool = [_meta(i, "t", "1A", "Same") for i in range(3)] + [_meta(3, "t", "1A", "Other")]
+    chosen = sample_balanced(pool, 3, None, random.Random(2))
+    assert len(chosen) == 3 and "Other" in {q["instructions"] for q in chosen}
+
+
+def test_balanced_exam_id_reproduces_the_same_questions(make_book):
+    types = ["fill_in_the_blanks_one_word", "multiple_choice", "matching"]
+    books_dir = make_book("B", {
+        f"UNIT-{unit}/UNIDADE-{unit}-QUESTAO-{n}-GRAMMAR.json":
+            [question(unit * 100 + n * 10 + i, f"{unit}{'AB'[i % 2]}", q_type=types[(n + i) % 3]) for i in range(3)]
+        for unit in (1, 2) for n in range(1, 5)})
+    config = {"grammar": 5, "vocabulary": 0}
+    exam_id = make_exam_id("B", ["1A", "1B", "2A", "2B"], config, 987654, SAMPLER_VERSION)
+    assert exam_id.endswith("-S2")
+    params = parse_exam_id(exam_id)
+    drawn = [exam_selection(params["book"], params["units"], params["questions_config"], params["seed"],
+                            books_dir, params["sampler"], params["variant"]) for _ in range(2)]
+    assert len(drawn[0]) == 5
+    assert [q["digest"] for q in drawn[0]] == [q["digest"] for q in drawn[1]]
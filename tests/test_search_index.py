@@ -0,0 +1,42 @@
+import json
+import os
+from conftest import question
+from question_bank import refresh_book_index
+from search_index import BookSearchIndex
+
+FILES = {f"UNIT-1/UNIDADE-1-QUESTAO-{n}-GRAMMAR.json": [question(n * 10 + i, "1A", instructions=text)
+                                                         for i, text in enumerate(texts)]
+         for n, texts in enumerate([["Past simple of go", "Irregular verbs"], ["Present perfect"],
+                                    ["Past continuous", "Irregular plurals"]], start=1)}
+QUERIES = ["past", "irregular", "present perfect", "verbs", "plural", "mountains", ""]
+
+
+def _results(index: BookSearchIndex) -> list:
+    return [[(hit["digest"], hit["score"]) for hit in index.search(query)["hits"]] for query in QUERIES]
+
+
+def test_incremental_update_matches_a_full_rebuild(make_book, tmp_path):
+    books_dir, cache_dir = make_book("B", FILES), str(tmp_path / "cache")
+    index = BookSearchIndex()
+    assert index.update(refresh_book_index("B", books_dir, cache_dir)) == 3
+
+    book_path = os.path.join(books_dir, "B")
+    with open(os.path.join(book_path, "UNIT-1/UNIDADE-1-QUESTAO-1-GRAMMAR.json"), 'w', encoding="utf-8") as f:
+        json.dump({"questions": [question(10, "1A", instructions="Past simple of climb the mountains")]}, f)
+    os.remove(os.path.join(book_path, "UNIT-1/UNIDADE-1-QUESTAO-2-GRAMMAR.json"))
+    make_book("B", {"UNIT-1/UNIDADE-1-QUESTAO-4-GRAMMAR.json": [question(40, "1A", instructions="Irregular verbs")]})
+
+    book_index = refresh_book_index("B", books_dir, cache_dir)
+    assert index.update(book_index) == 2  # o arquivo alterado e o novo; o terceiro não é relido
+    rebuilt = BookSearchIndex()
+    rebuilt.update(book_index)
+    assert index._postings == rebuilt._postings
+    assert _results(index) == _results(rebuilt)
+    assert index.search("present")["total"] == 0 and index.search("mountains")["total"] == 1
+
+
+def test_unchanged_book_is_not_reindexed(make_book, tmp_path):
+    books_dir, cache_dir = make_book("B", FILES), str(tmp_path / "cache")
+    index = BookSearchIndex()
+    index.update(refresh_book_index("B", books_dir, cache_dir))
+    assert index.update(refresh_book_index("B", books_dir, cache_dir)) == 0
@@ -0,0 +1,75 @@
+import os
+import threading
+import pytest
+from shared_cache import DiskCache, RedisCache, TieredCache, scan_directory
+from fragment_cache import LRUByteCache
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # scripts Lua no fakeredis
+
+
+def _redis_cache(max_bytes: int) -> RedisCache:
+    return RedisCache(max_bytes=max_bytes, client=fakeredis.FakeRedis())
+
+
+def _stored_bytes(cache: RedisCache) -> int:
+    return sum(cache._client.strlen(key) for key in cache._client.keys(f"{cache._prefix}*")
+               if key not in (cache._lru_key.encode(), cache._size_key.encode()))
+
+
+def test_redis_round_trip():
+    cache = _redis_cache(1024)
+    cache.put("a", b"alpha")
+    assert cache.get("a") == b"alpha"
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_redis_evicts_least_recently_used():
+    cache = _redis_cache(3000)
+    for name in "abc":
+        cache.put(name, bytes(1000))
+    cache.get("a")  # "b" passa a ser o menos usado
+    cache.put("d", bytes(1000))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    assert int(cache._client.get(cache._size_key)) == _stored_bytes(cache) <= 3000
+
+
+def test_redis_counter_survives_concurrent_writers():
+    client = fakeredis.FakeRedis()
+    replicas = [RedisCache(max_bytes=50_000, client=client) for _ in range(4)]
+
+    def write(cache, size):
+        for i in range(100):
+            cache.put(f"key{i % 10}", bytes(size + i % 7))
+
+    threads = [threading.Thread(target=write, args=(cache, 500 + 100 * n)) for n, cache in enumerate(replicas)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert int(client.get(replicas[0]._size_key)) == _stored_bytes(replicas[0])
+
+
+def test_disk_cache_evicts_to_low_water(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    for i in range(30):
+        cache.put(f"k{i}", os.urandom(1000))
+    total = scan_directory(str(tmp_path))[1]
+    assert total <= 10_000
+    assert cache.get("k29") is not None and cache.get("k0") is None
+
+
+def test_tiered_cache_survives_a_failing_backend():
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def put(self, key, value):
+            raise ConnectionError("down")
+
+    cache = TieredCache(LRUByteCache(1024), Broken())
+    cache.put(("exam", "x"), b"doc")
+    assert cache.get(("exam", "x")) == b"doc"
+    assert cache.get(("exam", "y")) is None
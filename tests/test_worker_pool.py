@@ -0,0 +1,39 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from pdf_renderer import render_pdf
+from worker_pool import WorkerPool
+
+
+def test_map_keeps_order_and_reuses_the_pool():
+    pool = WorkerPool(workers=2)
+    try:
+        assert list(pool.map(abs, [-3, -1, -2])) == [3, 1, 2]
+        executor = pool._executor
+        assert list(pool.map(abs, [-5, -4])) == [5, 4]
+        assert pool._executor is executor
+    finally:
+        pool.shutdown()
+
+
+def test_run_uses_the_workers_with_bounded_slots():
+    pool = WorkerPool(workers=1, max_pending=1)
+    try:
+        assert pool.run(render_pdf, [("line", "text")]).startswith(b"%PDF")
+        assert pool._executor is not None
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("call", [lambda pool: list(pool.map(os._exit, [1, 1])),
+                                  lambda pool: pool.run(os._exit, 1)])
+def test_broken_pool_is_replaced(call):
+    pool = WorkerPool(workers=2, max_pending=2)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            call(pool)
+        assert pool._executor is None
+        assert pool.run(abs, -1) == 1
+        assert list(pool.map(abs, [-1, -2])) == [1, 2]
+    finally:
+        pool.shutdown()
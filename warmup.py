@@ -0,0 +1,116 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from question_bank import BOOKS_DIR, list_books, load_book_index, load_questions
+
+# --- Startup Warm-Up ---
+#
+# Depois de um deploy, o primeiro usuário de cada livro pagava as importações pesadas
+# (python-docx/lxml), a compilação do índice, o índice de busca e a primeira montagem
+# de documento. O aquecimento faz tudo isso antes, e mede cada etapa:
+#
+#   python warmup.py                    # comando separado, p.ex. antes de liberar o tráfego
+#   python warmup.py --format docx pdf --json warmup.json
+#
+# Como comando separado, aquece o que é compartilhado entre processos (índices em disco).
+# Com CCB_WARMUP=1 (padrão), a página do Streamlit e a API HTTP também o executam ao
+# iniciar, aquecendo os caches em memória do processo (renderizador e fragmentos).
+
+WARMUP_ON_START = os.environ.get("CCB_WARMUP", "1") == "1"
+HEAVY_MODULES = ("lxml.etree", "docx", "exam_generator", "search_index")
+DEFAULT_QUESTIONS = {"grammar": 3, "vocabulary": 3}  # a configuração inicial da página
+WARMUP_SEED = 0
+
+
+def _timed(steps: list, name: str, fn, *args, **kwargs):
+    """Runs one step and appends {"step", "seconds", "error"} to steps; errors do not stop the warm-up."""
+    started = time.perf_counter()
+    error = None
+    try:
+        fn(*args, **kwargs)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    steps.append({"step": name, "seconds": time.perf_counter() - started, "error": error})
+
+
+def _render(book: str, units: list, lang: str, output_format: str, books_dir: str):
+    # Renderiza sem passar pelo EXAM_CACHE: um acerto no cache compartilhado (de outro
+    # processo ou de um deploy anterior) não aqueceria o renderizador nem os fragmentos
+    from exam_generator import exam_selection, render_exam_documents
+    selected = exam_selection(book, units, DEFAULT_QUESTIONS, WARMUP_SEED, books_dir)
+    question_list = load_questions(load_book_index(book, books_dir), selected)
+    render_exam_documents(book, units, question_list, lang, output_format=output_format)
+
+
+def warm_up(books_dir: str = BOOKS_DIR, books: list = None, render: bool = True,
+            output_formats: tuple = ("docx",), lang: str = None) -> list:
+    """
+    Imports the heavy modules, builds the question and search indexes of every book and
+    pre-renders the default configuration (3 grammar / 3 vocabulary, all units) of each
+    one. Returns the steps in order with their durations in seconds.
+    """
+    steps = []
+    for module in HEAVY_MODULES:
+        _timed(steps, f"import {module}", importlib.import_module, module)
+
+    from docx_renderer import get_base_template
+    from exam_generator import expand_units
+    from i18n import DEFAULT_LANG, catalogue
+    from search_index import search_index
+
+    lang = lang or DEFAULT_LANG
+    _timed(steps, "docx template", get_base_template)
+    _timed(steps, f"catalogue {lang}", catalogue, lang)
+
+    for book in (books or sorted(list_books(books_dir))):
+        _timed(steps, f"{book}: question index", load_book_index, book, books_dir)
+        _timed(steps, f"{book}: search index", search_index, book, books_dir)
+        if not render:
+            continue
+        parsed_units = load_book_index(book, books_dir)["units"]
+        units = expand_units(parsed_units, sorted(parsed_units, key=int))
+        for output_format in output_formats:
+            _timed(steps, f"{book}: render {output_format}", _render, book, units, lang, output_format, books_dir)
+    return steps
+
+
+def start_warm_up(books_dir: str = BOOKS_DIR) -> threading.Thread:
+    """Runs warm_up() in a background thread (used at server start) and returns the thread."""
+    thread = threading.Thread(target=warm_up, args=(books_dir,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def format_report(steps: list) -> str:
+    width = max((len(step["step"]) for step in steps), default=0)
+    lines = [f"{step['step']:<{width}}  {step['seconds'] * 1000:9.1f} ms"
+             + (f"  FAILED {step['error']}" if step["error"] else "") for step in steps]
+    lines.append(f"{'total':<{width}}  {sum(step['seconds'] for step in steps) * 1000:9.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Warms up the caches of the exam generator and times each step.")
+    parser.add_argument("books", nargs="*", help="Books to warm up (default: every book in --books-dir).")
+    parser.add_argument("--books-dir", default=BOOKS_DIR)
+    parser.add_argument("--format", nargs="+", default=["docx"], dest="formats", help="Formats to pre-render.")
+    parser.add_argument("--lang", help="Language of the pre-rendered documents (default: the page default).")
+    parser.add_argument("--no-render", action="store_true", help="Only import the modules and build the indexes.")
+    parser.add_argument("--json", help="Also write the timings as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    steps = warm_up(args.books_dir, args.books or None, render=not args.no_render,
+                    output_formats=tuple(args.formats), lang=args.lang)
+    print(format_report(steps))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(steps, f, indent=2)
+    return 1 if any(step["error"] for step in steps) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
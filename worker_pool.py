@@ -0,0 +1,92 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- Long-Lived Process Pools ---
+#
+# Os pools de processos do servidor (PDF_POOL em pdf_renderer.py, BATCH_POOL em
+# exam_generator.py) são criados uma vez por processo, na primeira tarefa. Os workers
+# nascem do forkserver (spawn onde ele não existe): um fork do servidor, que já roda
+# threads de jobs, poderia copiar travas seguradas por elas. Se um worker morre (p.ex.
+# por falta de memória), o pool quebrado é descartado e a próxima tarefa abre outro.
+
+
+def process_context():
+    """multiprocessing context of the worker pools: forkserver, or spawn where it does not exist."""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class WorkerPool:
+    """
+    Long-lived process pool shared by every caller of the process. With max_pending,
+    at most workers + max_pending tasks are accepted at once; further callers wait for
+    a free slot.
+    """
+
+    def __init__(self, workers: int, max_pending: int = None):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if max_pending is not None else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+        return self._executor
+
+    def _discard_broken(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _submit(self, executor: ProcessPoolExecutor, fn, *args):
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+        if self._slots is not None:
+            future.add_done_callback(lambda _f: self._slots.release())
+        return future
+
+    def run(self, fn, *args, timeout: float = None):
+        """Runs fn(*args) in a worker process and returns its result (in this process when workers <= 0)."""
+        if self.workers <= 0:
+            return fn(*args)
+        executor = self._get_executor()
+        try:
+            return self._submit(executor, fn, *args).result(timeout=timeout)
+        except BrokenProcessPool:
+            self._discard_broken(executor)
+            raise
+
+    def map(self, fn, jobs: list):
+        """
+        Yields fn(job) for each job, in order, computed in the worker processes. With a
+        single worker or a single job there is nothing to parallelize: they run here.
+        """
+        if self.workers <= 1 or len(jobs) <= 1:
+            yield from map(fn, jobs)
+            return
+        executor = self._get_executor()
+        try:
+            futures = [self._submit(executor, fn, job) for job in jobs]
+            for future in futures:
+                yield future.result()
+        except BrokenProcessPool:
+            self._discard_broken(executor)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None